@@ -41,9 +41,35 @@ const int servoUpPos = 90;
 const int servoDownPos = 70;  
 int currentPos[16]; 
 
+// Framed binary protocol (keep in sync with protocol.py)
+// SYNC | LEN | TYPE | SEQ | payload (LEN-2) | CRC-8 of LEN..payload
+#define FRAME_SYNC    0xA5
+#define FRAME_MAX     16
+#define T_POSE        0x81
+#define T_PUMP        0x82
+#define T_REQUEST     0x83
+#define T_CAR         0x84
+#define T_HELLO       0x85
+#define T_PING        0x86
+#define T_SERVO       0x87
+#define T_ACK         0xC0
+#define T_DISTANCE    0xC1
+#define ACK_OK        0
+#define ACK_BAD_CRC   1
+#define ACK_UNKNOWN   2
+
+byte frameBuf[FRAME_MAX + 5];   // SYNC + LEN + TYPE + SEQ + payload + CRC
+byte frameLen = 0;
+unsigned long lastFrameByte = 0;
+const long baudRates[] = {0, 9600, 19200, 38400, 57600, 115200};
+long currentBaud = 9600;
+long fallbackBaud = 0;            // old rate until a frame arrives at the new one
+unsigned long baudSwitchedAt = 0;
+bool framedLink = false;          // after HELLO every command arrives as a frame
+
 /* ================= SETUP ================= */
 void setup() {
-  Serial.begin(9600);
+  Serial.begin(currentBaud);
 
   // --- Car Setup ---
   pinMode(LM_F, OUTPUT); pinMode(LM_B, OUTPUT);
@@ -111,7 +137,17 @@ void loop() {
 
 /* ================= SMART COMMAND PARSER ================= */
 void readSmartCommand() {
-  if (Serial.available() > 0) {
+  // Framed commands: drain every buffered frame this pass (no parseInt() wait)
+  while (Serial.available() > 0) {
+    if (frameLen > 0 || Serial.peek() == FRAME_SYNC) readFrameByte(Serial.read());
+    else if (framedLink) Serial.read(); // tail of a frame that lost sync (bad LEN, stale, RX overflow): never a car command
+    else break;
+  }
+  if (frameLen > 0 && millis() - lastFrameByte > 50) frameLen = 0; // drop a stale partial frame
+  checkBaudFallback();
+
+  // Old ASCII commands: one per pass, as before (only until the host negotiates frames)
+  if (!framedLink && frameLen == 0 && Serial.available() > 0) {
     char c = Serial.peek(); 
 
     if (isDigit(c)) {
@@ -130,6 +166,104 @@ void readSmartCommand() {
   }
 }
 
+/* ================= FRAMED PROTOCOL ================= */
+byte crc8(const byte *data, byte len) {
+  byte crc = 0;
+  for (byte i = 0; i < len; i++) {
+    crc ^= data[i];
+    for (byte b = 0; b < 8; b++) crc = (crc & 0x80) ? (crc << 1) ^ 0x07 : (crc << 1);
+  }
+  return crc;
+}
+
+void sendFrame(byte type, byte seq, const byte *payload, byte len) {
+  byte body[FRAME_MAX + 3];
+  body[0] = len + 2; body[1] = type; body[2] = seq;
+  for (byte i = 0; i < len; i++) body[3 + i] = payload[i];
+  Serial.write(FRAME_SYNC);
+  Serial.write(body, len + 3);
+  Serial.write(crc8(body, len + 3));
+}
+
+void sendAck(byte seq, byte status) { sendFrame(T_ACK, seq, &status, 1); }
+
+void readFrameByte(byte b) {
+  lastFrameByte = millis();
+  frameBuf[frameLen++] = b;
+  if (frameLen == 2 && (b < 2 || b > FRAME_MAX + 2)) { frameLen = 0; return; } // bad length
+  if (frameLen >= 2 && frameLen == frameBuf[1] + 3) {
+    handleFrame();
+    frameLen = 0;
+  }
+}
+
+void handleFrame() {
+  byte len = frameBuf[1];
+  byte type = frameBuf[2];
+  byte seq = frameBuf[3];
+  byte *payload = frameBuf + 4;
+  if (crc8(frameBuf + 1, len + 1) != frameBuf[len + 2]) { sendAck(seq, ACK_BAD_CRC); return; }
+  fallbackBaud = 0; // a good frame at this rate confirms it
+
+  if (type == T_POSE) {
+    // channel mask, then one angle per set bit
+    byte mask = payload[0], i = 1;
+    for (byte ch = 0; ch < 8; ch++) {
+      if (mask & (1 << ch)) setFastPos(ch, payload[i++]);
+    }
+    sendAck(seq, ACK_OK);
+  }
+  else if (type == T_PUMP) {
+    digitalWrite(pumpPin, payload[0] ? LOW : HIGH);
+    sendAck(seq, ACK_OK);
+  }
+  else if (type == T_REQUEST && payload[0] == 0) {
+    long dist = readArmDistance(); // reply doubles as the ACK
+    byte reply[2] = {(byte)(dist & 0xFF), (byte)(dist >> 8)};
+    sendFrame(T_DISTANCE, seq, reply, 2);
+  }
+  else if (type == T_REQUEST && payload[0] == 1) {
+    sendAck(seq, ACK_OK);
+    runAutoCheckSequence();
+  }
+  else if (type == T_CAR) {
+    // car / mode letters, same meaning as the ASCII commands
+    for (byte i = 0; i < len - 2; i++) handleCarCommand((char)payload[i]);
+    sendAck(seq, ACK_OK);
+  }
+  else if (type == T_SERVO) {
+    // channel, angle for anything outside the pose mask (channels 8..15)
+    sendAck(seq, ACK_OK);
+    handleArmCommand(payload[0], payload[1]);
+  }
+  else if (type == T_HELLO && payload[0] >= 1 && payload[0] <= 5) {
+    // ACK at the current rate, then switch; fall back if nothing arrives within 1 s
+    framedLink = true; // the host speaks frames from now on (a port reopen resets the board)
+    sendAck(seq, ACK_OK);
+    Serial.flush();
+    Serial.end();
+    fallbackBaud = currentBaud;
+    currentBaud = baudRates[payload[0]];
+    Serial.begin(currentBaud);
+    baudSwitchedAt = millis();
+  }
+  else if (type == T_PING) {
+    sendAck(seq, ACK_OK);
+  }
+  else {
+    sendAck(seq, ACK_UNKNOWN);
+  }
+}
+
+void checkBaudFallback() {
+  if (fallbackBaud && millis() - baudSwitchedAt > 1000) {
+    Serial.end();
+    currentBaud = fallbackBaud;
+    Serial.begin(currentBaud);
+    fallbackBaud = 0;
+  }
+}
+
 /* ================= CAR LOGIC (YOUR CODE) ================= */
 void handleCarCommand(char cmd) {
   // Mode Control
@@ -0,0 +1,139 @@
+import copy
+import json
+import os
+import threading
+import time
+
+# Configuration and pluggable hardware backends. Every backend is created by a
+# named factory on its own background thread, so the web UI can bind at once
+# and report readiness while the camera, Arduino and model come up in parallel.
+# Hardware libraries are imported inside the factories that need them.
+
+DEFAULT_CONFIG = {
+    "camera": {"backend": "picamera2", "size": [640, 480], "source": None, "fps": 30},
+    "serial": {"backend": "serial", "ports": ["/dev/ttyACM0", "/dev/ttyUSB0"], "baud": 9600, "reset_wait": 2.0,
+               "protocol": "framed", "fast_baud": 115200},
+    "model": {"backend": "tflite", "path": "/home/bluefox/tomato_model_v2.tflite", "threads": 4, "stub_delay": 0.08},
+    "server": {"host": "0.0.0.0", "port": 5000},
+}
+
+def _merge(base, override):
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(base.get(key), dict): _merge(base[key], value)
+        else: base[key] = value
+    return base
+
+def load_config(path=None):
+    # defaults <- JSON file (AGRIBOT_CONFIG or ./agribot.json) <- AGRIBOT_SERIAL / AGRIBOT_MODEL
+    config = copy.deepcopy(DEFAULT_CONFIG)
+    path = path or os.environ.get('AGRIBOT_CONFIG', 'agribot.json')
+    if os.path.exists(path):
+        with open(path) as f: _merge(config, json.load(f))
+    if os.environ.get('AGRIBOT_SERIAL'): config['serial']['ports'] = [os.environ['AGRIBOT_SERIAL']]
+    if os.environ.get('AGRIBOT_MODEL'): config['model']['path'] = os.environ['AGRIBOT_MODEL']
+    return config
+
+# --- 1. Factories ---
+def picamera2_camera(cfg):
+    from picamera2 import Picamera2
+    cam = Picamera2()
+    cam.configure(cam.create_preview_configuration(main={"size": tuple(cfg['size']), "format": "XRGB8888"}))
+    cam.start()
+    return cam
+
+def replay_camera(cfg):
+    import sim
+    if not cfg.get('source'): raise ValueError("camera.source must name an image folder or video")
+    return sim.FakeCamera(cfg['source'], fps=cfg['fps'])
+
+def sim_camera(cfg):
+    import sim
+    return sim.FakeCamera(fps=cfg['fps'])
+
+def serial_port(cfg):
+    import serial
+    errors = []
+    for port in cfg['ports']:
+        try:
+            conn = serial.Serial(port, cfg['baud'], timeout=1)
+            time.sleep(cfg['reset_wait'])   # opening the port resets the Arduino
+            conn.port_name = port
+            return conn
+        except Exception as e:
+            errors.append(f"{port}: {e}")
+    raise IOError("; ".join(errors))
+
+def sim_serial(cfg):
+    import serial
+    import sim
+    fake = sim.FakeArduino(baud=cfg['baud'])
+    conn = serial.Serial(fake.port, cfg['baud'], timeout=1)
+    conn.port_name, conn.sim = fake.port, fake
+    return conn
+
+def tflite_model(cfg):
+    try:
+        import tflite_runtime.interpreter as tflite
+    except ImportError:
+        import tensorflow.lite as tflite
+    if not os.path.exists(cfg['path']): raise FileNotFoundError(cfg['path'])
+    interpreter = tflite.Interpreter(model_path=cfg['path'], num_threads=cfg['threads'])
+    interpreter.allocate_tensors()
+    return interpreter
+
+def stub_model(cfg):
+    import sim
+    interpreter = sim.StubInterpreter(delay=cfg['stub_delay'], quantized=cfg.get('stub_quantized', False))
+    interpreter.allocate_tensors()
+    return interpreter
+
+FACTORIES = {
+    "camera": {"picamera2": picamera2_camera, "replay": replay_camera, "sim": sim_camera},
+    "serial": {"serial": serial_port, "sim": sim_serial},
+    "model": {"tflite": tflite_model, "stub": stub_model},
+}
+
+def register(kind, name, factory): FACTORIES[kind][name] = factory
+
+# --- 2. Background startup ---
+class Backends:
+    def __init__(self, config):
+        self.config = config
+        self.cond = threading.Condition()
+        self.objects = {}
+        self.status = {}
+        self.listeners = []   # fn(kind, status) on every state change
+
+    def start(self, kind):
+        cfg = self.config[kind]
+        with self.cond: self.status[kind] = {"state": "starting", "backend": cfg['backend']}
+        threading.Thread(target=self._open, args=(kind, cfg), daemon=True).start()
+
+    def start_all(self):
+        for kind in FACTORIES: self.start(kind)
+
+    def _open(self, kind, cfg):
+        t0 = time.time()
+        try:
+            if cfg['backend'] == 'none': raise RuntimeError("disabled in config")
+            obj = FACTORIES[kind][cfg['backend']](cfg)
+            status = {"state": "ready", "backend": cfg['backend'], "seconds": round(time.time() - t0, 2)}
+        except Exception as e:
+            obj = None
+            status = {"state": "failed", "backend": cfg['backend'], "error": str(e), "seconds": round(time.time() - t0, 2)}
+        with self.cond:
+            self.objects[kind] = obj
+            self.status[kind] = status
+            self.cond.notify_all()
+        for fn in list(self.listeners): fn(kind, status)
+
+    def wait(self, kind, timeout=None):
+        # The backend object once started, or None if it failed or is still starting
+        with self.cond:
+            self.cond.wait_for(lambda: self.status.get(kind, {}).get('state') not in (None, 'starting'), timeout)
+            return self.objects.get(kind)
+
+    def get(self, kind): return self.objects.get(kind)
+
+    def ready(self):
+        with self.cond: return {kind: dict(s) for kind, s in self.status.items()}
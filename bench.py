@@ -0,0 +1,265 @@
+import argparse
+import io
+import json
+import os
+import threading
+import time
+import urllib.request
+import cv2
+import numpy as np
+
+# Agri-Bot benchmarks. Run against a live server, e.g.
+#   python bench.py mjpeg --url http://raspberrypi:5000/video_feed --clients 1,4 --pid <server pid>
+# or against simulated hardware anywhere:
+#   python bench.py sim
+
+# --- 1. MJPEG fan-out (fps per client + server CPU) ---
+def read_mjpeg(url, stop, counts, idx):
+    try:
+        with urllib.request.urlopen(url, timeout=5) as resp:
+            buf = b''
+            while not stop.is_set():
+                chunk = resp.read(4096)
+                if not chunk: break
+                buf += chunk
+                while True:
+                    pos = buf.find(b'--frame', 1)
+                    if pos < 0: break
+                    counts[idx] += 1
+                    buf = buf[pos:]
+    except Exception as e:
+        print(f"⚠️ client {idx}: {e}")
+
+def cpu_seconds(pid):
+    if not pid: return None
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(')', 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+def bench_mjpeg(url, n_clients, seconds, pid=None):
+    stop = threading.Event()
+    counts = [0] * n_clients
+    threads = [threading.Thread(target=read_mjpeg, args=(url, stop, counts, i), daemon=True) for i in range(n_clients)]
+    for t in threads: t.start()
+    time.sleep(1.0)  # warm-up: let every client connect
+    start_counts = list(counts)
+    cpu0 = cpu_seconds(pid); t0 = time.time()
+    time.sleep(seconds)
+    cpu1 = cpu_seconds(pid); elapsed = time.time() - t0
+    fps = [(c - s) / elapsed for c, s in zip(counts, start_counts)]
+    stop.set()
+    cpu = None if cpu0 is None else 100.0 * (cpu1 - cpu0) / elapsed
+    return fps, cpu
+
+def cmd_mjpeg(args):
+    print(f"{'clients':>7} {'fps/client':>10} {'min fps':>8} {'server CPU %':>12}")
+    for n in [int(x) for x in args.clients.split(',')]:
+        fps, cpu = bench_mjpeg(args.url, n, args.seconds, args.pid)
+        cpu_txt = '-' if cpu is None else f"{cpu:.1f}"
+        print(f"{n:>7} {sum(fps) / n:>10.1f} {min(fps):>8.1f} {cpu_txt:>12}")
+
+# --- 2. Scan preprocessing (JPEG round trip vs preallocated tensor) ---
+def legacy_preprocess(xrgb):
+    # What /predict used to do: capture_file(jpeg) -> PIL decode -> resize -> float32 copy
+    from PIL import Image
+    stream = io.BytesIO()
+    Image.fromarray(xrgb[:, :, 2::-1]).save(stream, format='JPEG')
+    stream.seek(0)
+    img = Image.open(stream).convert('RGB').resize((224, 224))
+    return np.expand_dims(np.array(img, dtype=np.float32) / 255.0, axis=0)
+
+def time_per_call(fn, arg, repeat):
+    fn(arg)
+    t0 = time.perf_counter()
+    for _ in range(repeat): fn(arg)
+    return (time.perf_counter() - t0) / repeat * 1000.0
+
+def cmd_preprocess(args):
+    from vision import TensorPreprocessor
+    xrgb = np.random.randint(0, 256, (480, 640, 4), dtype=np.uint8)
+    print(f"{'path':<28} {'ms/scan':>8}")
+    print(f"{'legacy jpeg+PIL float32':<28} {time_per_call(legacy_preprocess, xrgb, args.repeat):>8.2f}")
+    for name, dtype, quant in [('tensor float32', np.float32, (0.0, 0)), ('tensor uint8 (quantized)', np.uint8, (1 / 255.0, 0))]:
+        prep = TensorPreprocessor({'shape': (1, 224, 224, 3), 'dtype': dtype, 'quantization': quant})
+        print(f"{name:<28} {time_per_call(prep, xrgb, args.repeat):>8.2f}")
+
+# --- 3. Stop-to-halt latency (100 ms polling vs Event cancellation) ---
+def legacy_job(flag, halted):
+    # Old smart_sleep(): poll a global every 100 ms
+    end_time = time.time() + 60
+    while time.time() < end_time:
+        if not flag['running']: break
+        time.sleep(0.1)
+    halted.append(time.perf_counter())
+
+def event_job(job, halted):
+    job.sleep(60)
+    halted.append(time.perf_counter())
+
+def cmd_stop(args):
+    import random
+    from jobs import JobRunner
+    legacy, event = [], []
+    runner = JobRunner()
+    for _ in range(args.trials):
+        flag, halted = {'running': True}, []
+        t = threading.Thread(target=legacy_job, args=(flag, halted)); t.start()
+        time.sleep(random.uniform(0.05, 0.25))
+        t0 = time.perf_counter(); flag['running'] = False; t.join()
+        legacy.append((halted[0] - t0) * 1000)
+        halted = []
+        job = runner.start('bench', event_job, halted)
+        time.sleep(random.uniform(0.05, 0.25))
+        t0 = time.perf_counter(); runner.stop(); job.thread.join()
+        event.append((halted[0] - t0) * 1000)
+    print(f"{'cancellation':<14} {'avg ms':>7} {'max ms':>7}")
+    for name, vals in [('smart_sleep', legacy), ('event', event)]:
+        print(f"{name:<14} {sum(vals) / len(vals):>7.2f} {max(vals):>7.2f}")
+
+# --- 4. Color tracking (full-frame HSV + RETR_TREE vs ROI tracker) ---
+def legacy_track(frame):
+    hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+    mask = cv2.inRange(hsv, np.array([0, 120, 70]), np.array([10, 255, 255])) + cv2.inRange(hsv, np.array([170, 120, 70]), np.array([180, 255, 255]))
+    contours, _ = cv2.findContours(mask, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
+    return cv2.boundingRect(max(contours, key=cv2.contourArea)) if contours else None
+
+def synthetic_frames(size, n):
+    w, h = size
+    rng = np.random.default_rng(0)
+    base = rng.integers(0, 120, (h, w, 3), dtype=np.uint8)
+    base[:, :, 1] = rng.integers(60, 200, (h, w), dtype=np.uint8)   # leafy background
+    frames = []
+    for i in range(n):
+        frame = base.copy()
+        cx = int(w * (0.3 + 0.4 * i / n))
+        cv2.circle(frame, (cx, h // 2), h // 10, (20, 20, 200), -1)
+        frames.append(frame)
+    return frames
+
+def cmd_track(args):
+    from vision import ColorTracker
+    print(f"{'tracker':<22} {'ms/frame':>8}")
+    for name, size, fn in [('legacy 320x240', (320, 240), legacy_track), ('legacy 640x480', (640, 480), legacy_track),
+                           ('ROI tracker 640x480', (640, 480), ColorTracker('RED').detect)]:
+        frames = synthetic_frames(size, args.frames)
+        t0 = time.perf_counter()
+        for f in frames: fn(f)
+        print(f"{name:<22} {(time.perf_counter() - t0) / len(frames) * 1000:>8.2f}")
+
+# --- 5. Whole app on simulated hardware ---
+def load_simulated_app(args):
+    # Registers simulated backends, then imports python.py exactly as on the robot
+    import tempfile
+    import serial
+    import sim
+    import backends
+    workdir = tempfile.mkdtemp(prefix='agribot-bench-')
+    px_per_deg = 640 / 62.2
+    arduino = sim.FakeArduino(distance=lambda pos: max(3, 25 - (pos[1] - 90) * 0.75))
+    fruits = [float(a) for a in str(args.fruit_angle).split(',')]
+    def fruit_xs():
+        # a closed gripper on an extended arm takes the fruit nearest the base angle
+        if fruits and arduino.pos[3] >= 140 and arduino.pos[1] > 90:
+            nearest = min(fruits, key=lambda a: abs(a - arduino.pos[0]))
+            if abs(nearest - arduino.pos[0]) <= 5: fruits.remove(nearest)
+        return [min(max(320 + (arduino.pos[0] - a) * px_per_deg, -100), 740) for a in fruits]
+    backends.register('camera', 'bench', lambda cfg: sim.FakeCamera(args.frames, fps=args.fps, scene=None if args.frames else lambda: sim.synthetic_frame(fruit_xs())))
+    backends.register('serial', 'bench', lambda cfg: serial.Serial(arduino.port, cfg['baud'], timeout=1))
+    backends.register('model', 'bench', lambda cfg: backends.stub_model(dict(cfg, stub_delay=args.infer_delay,
+                                                                                  stub_quantized=getattr(args, 'quantized', False))))
+    config = os.path.join(workdir, 'agribot.json')
+    with open(config, 'w') as f:
+        json.dump({"camera": {"backend": "bench"}, "serial": {"backend": "bench"}, "model": {"backend": "bench"}}, f)
+    os.environ['AGRIBOT_CONFIG'] = config
+    os.chdir(workdir)   # Scan_History/, Recordings/ land in the temp dir
+    t0 = time.perf_counter()
+    import python as app
+    startup = {'ui': time.perf_counter() - t0}
+    for kind in ('camera', 'serial', 'model'):
+        app.hardware.wait(kind, 10)
+        startup[kind] = time.perf_counter() - t0
+    return app, arduino, startup
+
+def serve(app, port):
+    from werkzeug.serving import make_server
+    server = make_server('127.0.0.1', port, app.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{port}"
+
+def timed_get(url):
+    t0 = time.perf_counter()
+    with urllib.request.urlopen(url, timeout=30) as resp: resp.read()
+    return (time.perf_counter() - t0) * 1000
+
+def cmd_sim(args):
+    app, arduino, startup = load_simulated_app(args)
+    base = serve(app, args.port)
+    results = [(f"startup to {k} ready s", f"{v:.2f}") for k, v in startup.items()]
+    time.sleep(0.5)
+    for n in [int(x) for x in args.clients.split(',')]:
+        fps, cpu = bench_mjpeg(base + '/video_feed', n, args.seconds, os.getpid())
+        results.append((f"mjpeg fps/client ({n} clients)", f"{sum(fps) / n:.1f}"))
+        results.append((f"process CPU % ({n} clients)", f"{cpu:.0f}"))
+    lat = [timed_get(base + '/predict') for _ in range(args.scans)]
+    results.append(("/predict ms (sequential avg)", f"{sum(lat) / len(lat):.1f}"))
+    lat = []
+    workers = [threading.Thread(target=lambda: lat.append(timed_get(base + '/predict'))) for _ in range(4)]
+    for t in workers: t.start()
+    for t in workers: t.join()
+    results.append(("/predict ms (4 concurrent, max)", f"{max(lat):.1f}"))
+    with urllib.request.urlopen(base + '/predict', timeout=30) as resp: scan = json.loads(resp.read())
+    results.append(("/predict accuracy % (0-100)", str(scan['accuracy'])))
+    lat = []
+    for _ in range(10):
+        t0 = time.perf_counter(); app.get_distance(); lat.append((time.perf_counter() - t0) * 1000)
+    results.append(("distance round trip ms (avg)", f"{sum(lat) / len(lat):.1f}"))
+    for i in range(200): app.on_move({'id': ['Base', 'Shoulder', 'Elbow', 'Gripper'][i % 4], 'val': 60 + i % 60})
+    time.sleep(1.0)
+    stats = app.serial_writer.stats()
+    results.append(("serial writes for 200 slider events", f"{stats['sent']} ({stats['coalesced']} coalesced)"))
+    results.append(("serial send->wire ms (avg / max)", f"{stats['latency_ms_avg']} / {stats['latency_ms_max']}"))
+    app.on_go_home(); time.sleep(1.0)
+    t0 = time.perf_counter()
+    job = app.jobs.start('harvest', app.harvest_thread_func, 'RED')
+    time.sleep(1.0)
+    rate = app.tracking.ticks / (time.perf_counter() - t0)
+    job.thread.join()
+    results.append(("tracking loop Hz", f"{rate:.1f}"))
+    results.append(("harvest sequence s", f"{time.perf_counter() - t0:.2f}"))
+    results.append(("harvest fruits picked", f"{app.harvest_stats.get('picked', 0)}/{app.harvest_stats.get('planned', 0)}"))
+    results.append(("harvest base corrections", str(app.harvest_stats.get('corrections', 0))))
+    width = max(len(r[0]) for r in results)
+    for name, value in results: print(f"{name:<{width}}  {value}")
+    arduino.close()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Agri-Bot benchmarks")
+    sub = parser.add_subparsers(dest='cmd', required=True)
+    p = sub.add_parser('mjpeg', help="fps per client and server CPU for 1 vs N /video_feed clients")
+    p.add_argument('--url', default='http://127.0.0.1:5000/video_feed')
+    p.add_argument('--clients', default='1,4')
+    p.add_argument('--seconds', type=float, default=10)
+    p.add_argument('--pid', type=int, help="server process id for CPU sampling")
+    p.set_defaults(func=cmd_mjpeg)
+    p = sub.add_parser('preprocess', help="scan preprocessing micro-benchmark")
+    p.add_argument('--repeat', type=int, default=200)
+    p.set_defaults(func=cmd_preprocess)
+    p = sub.add_parser('stop', help="stop-to-halt latency of harvest/playback jobs")
+    p.add_argument('--trials', type=int, default=20)
+    p.set_defaults(func=cmd_stop)
+    p = sub.add_parser('track', help="color tracking cost per frame")
+    p.add_argument('--frames', type=int, default=200)
+    p.set_defaults(func=cmd_track)
+    p = sub.add_parser('sim', help="run the whole app on simulated camera, Arduino and model")
+    p.add_argument('--frames', help="image directory or video file to replay (default: synthetic fruit)")
+    p.add_argument('--fps', type=float, default=30)
+    p.add_argument('--infer-delay', type=float, default=0.08, help="stub interpreter invoke() time, s")
+    p.add_argument('--quantized', action='store_true', help="stub model with uint8 input and output tensors")
+    p.add_argument('--fruit-angle', default='70', help="base angle(s) that centre the synthetic fruit, comma separated")
+    p.add_argument('--clients', default='1,4')
+    p.add_argument('--seconds', type=float, default=5)
+    p.add_argument('--scans', type=int, default=10)
+    p.add_argument('--port', type=int, default=5055)
+    p.set_defaults(func=cmd_sim)
+    args = parser.parse_args()
+    args.func(args)
@@ -0,0 +1,146 @@
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+import numpy as np
+import cv2
+
+# Scan history: JPEGs on disk plus an SQLite index of class, confidence,
+# timestamp and the full probability vector. Scans are queued and written by
+# one background thread in batches (one transaction per batch), so /predict
+# never waits on the SD card.
+#
+# Automatic retention is opt-in (retention_days / max_scans default to None)
+# and never touches scans imported from the old filename-only history; those
+# go only through an explicit prune() (/history/prune).
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scans (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    class_idx INTEGER,
+    class_name TEXT,
+    confidence REAL,
+    probs BLOB,
+    image TEXT
+);
+CREATE INDEX IF NOT EXISTS scans_ts ON scans(ts);
+CREATE INDEX IF NOT EXISTS scans_class_ts ON scans(class_name, ts);
+"""
+LEGACY_NAME = re.compile(r'^(?P<cls>.+)_(?P<acc>[\d.]+)%_(?P<ts>\d{2}-\d{2}-\d{4}_\d{2}-\d{2}-\d{2})\.jpg$')
+
+class HistoryStore:
+    def __init__(self, root, retention_days=None, max_scans=None, batch_size=16, flush_interval=2.0):
+        self.root = root
+        self.db_path = os.path.join(root, "history.db")
+        self.retention_days = retention_days
+        self.max_scans = max_scans
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=256)
+        self.dropped = 0
+        os.makedirs(root, exist_ok=True)
+        with self._connect() as db:
+            db.executescript(SCHEMA)
+            if db.execute("SELECT COUNT(*) FROM scans").fetchone()[0] == 0: self._import_legacy(db)
+        threading.Thread(target=self._run, daemon=True).start()
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.db_path, timeout=10)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        try:
+            with db: yield db
+        finally:
+            db.close()
+
+    def _import_legacy(self, db):
+        # Index scans saved before the database existed (metadata lived in the filename)
+        rows = []
+        for fn in os.listdir(self.root):
+            m = LEGACY_NAME.match(fn)
+            if not m: continue
+            ts = datetime.strptime(m.group('ts'), '%d-%m-%Y_%H-%M-%S').timestamp()
+            rows.append((ts, None, m.group('cls'), float(m.group('acc')) / 100.0, None, os.path.join(self.root, fn)))
+        if rows: db.executemany("INSERT INTO scans (ts, class_idx, class_name, confidence, probs, image) VALUES (?, ?, ?, ?, ?, ?)", rows)
+
+    # --- Writer ---
+    def record(self, rgb, class_idx, class_name, probs, ts=None):
+        # rgb must be a private copy: it is encoded later on the writer thread
+        item = (ts or time.time(), rgb, int(class_idx), class_name, np.asarray(probs, dtype=np.float32).ravel())
+        try: self.queue.put_nowait(item)
+        except queue.Full: self.dropped += 1
+
+    def _run(self):
+        last_prune = 0.0
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.time()
+                if remaining <= 0: break
+                try: batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty: break
+            try:
+                self._write(batch)
+                if (self.retention_days or self.max_scans) and time.time() - last_prune > 3600:
+                    self.prune(include_legacy=False); last_prune = time.time()
+            except Exception as e:
+                print(f"⚠️ History Error: {e}")
+
+    def _write(self, batch):
+        rows = []
+        for ts, rgb, class_idx, class_name, probs in batch:
+            day = datetime.fromtimestamp(ts)
+            folder = os.path.join(self.root, day.strftime('%Y-%m-%d'))
+            os.makedirs(folder, exist_ok=True)
+            path = os.path.join(folder, f"{day.strftime('%H-%M-%S')}_{int(ts * 1000) % 1000:03d}_{class_name}.jpg")
+            cv2.imwrite(path, cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR))
+            rows.append((ts, class_idx, class_name, float(probs[class_idx]), probs.tobytes(), path))
+        with self._connect() as db:
+            db.executemany("INSERT INTO scans (ts, class_idx, class_name, confidence, probs, image) VALUES (?, ?, ?, ?, ?, ?)", rows)
+
+    # --- Queries ---
+    def query(self, class_name=None, since=None, until=None, min_conf=None, limit=50, offset=0):
+        where, args = [], []
+        if class_name: where.append("class_name = ?"); args.append(class_name)
+        if since is not None: where.append("ts >= ?"); args.append(since)
+        if until is not None: where.append("ts < ?"); args.append(until)
+        if min_conf is not None: where.append("confidence >= ?"); args.append(min_conf)
+        clause = (" WHERE " + " AND ".join(where)) if where else ""
+        with self._connect() as db:
+            total = db.execute("SELECT COUNT(*) FROM scans" + clause, args).fetchone()[0]
+            rows = db.execute("SELECT id, ts, class_idx, class_name, confidence, probs FROM scans" + clause +
+                              " ORDER BY ts DESC LIMIT ? OFFSET ?", args + [limit, offset]).fetchall()
+        items = [{"id": r[0], "ts": r[1], "time": datetime.fromtimestamp(r[1]).isoformat(timespec='seconds'),
+                  "class_idx": r[2], "class": r[3], "confidence": round(r[4], 4),
+                  "probs": None if r[5] is None else [round(float(p), 4) for p in np.frombuffer(r[5], dtype=np.float32)]}
+                 for r in rows]
+        return {"total": total, "limit": limit, "offset": offset, "items": items}
+
+    def image_path(self, scan_id):
+        with self._connect() as db:
+            row = db.execute("SELECT image FROM scans WHERE id = ?", (scan_id,)).fetchone()
+        return row[0] if row else None
+
+    # --- Retention ---
+    def prune(self, retention_days=None, max_scans=None, include_legacy=True):
+        # Legacy rows (imported, class_idx NULL) are only removed when include_legacy is set
+        days = self.retention_days if retention_days is None else retention_days
+        keep = self.max_scans if max_scans is None else max_scans
+        scope = "" if include_legacy else " AND class_idx IS NOT NULL"
+        with self._connect() as db:
+            doomed = []
+            if days: doomed += db.execute("SELECT id, image FROM scans WHERE ts < ?" + scope, (time.time() - days * 86400,)).fetchall()
+            if keep: doomed += db.execute("SELECT id, image FROM scans WHERE 1" + scope + " ORDER BY ts DESC LIMIT -1 OFFSET ?", (keep,)).fetchall()
+            ids = {r[0]: r[1] for r in doomed}
+            db.executemany("DELETE FROM scans WHERE id = ?", [(i,) for i in ids])
+        for path in ids.values():
+            try: os.remove(path)
+            except OSError: pass
+        return len(ids)
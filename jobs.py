@@ -0,0 +1,58 @@
+import threading
+
+# Cancellable background jobs (harvest, playback). Stopping sets an Event, so
+# any job.sleep() in progress returns at once instead of waiting out a polling
+# step, and a new job is refused until the previous thread has fully unwound.
+
+class Job:
+    def __init__(self, job_id, kind):
+        self.id = job_id
+        self.kind = kind
+        self.cancelled = threading.Event()
+        self.thread = None
+        self.linked = []   # events woken on cancel so wait_for() returns at once
+
+    @property
+    def active(self): return not self.cancelled.is_set()
+
+    def sleep(self, duration):
+        # True if the full duration elapsed, False if the job was stopped
+        return not self.cancelled.wait(duration)
+
+    def wait_for(self, event, timeout):
+        # True if event fired while the job is still running
+        self.linked.append(event)
+        try:
+            if self.cancelled.is_set(): return False
+            return event.wait(timeout) and self.active
+        finally:
+            self.linked.remove(event)
+
+    def cancel(self):
+        self.cancelled.set()
+        for event in list(self.linked): event.set()
+
+class JobRunner:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.current = None
+        self.next_id = 1
+
+    def start(self, kind, target, *args):
+        with self.lock:
+            if self.current and self.current.thread.is_alive(): return None
+            job = Job(self.next_id, kind)
+            self.next_id += 1
+            job.thread = threading.Thread(target=target, args=(job,) + args, daemon=True)
+            self.current = job
+            job.thread.start()
+            return job
+
+    def stop(self):
+        with self.lock: job = self.current
+        if job: job.cancel()
+        return job
+
+    def active(self, kind=None):
+        job = self.current
+        return bool(job and job.active and job.thread.is_alive() and (kind is None or job.kind == kind))
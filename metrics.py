@@ -0,0 +1,111 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Minimal in-process metrics with Prometheus text exposition. Cheap enough to
+# leave on: an observation is one bisect and two additions under a lock.
+
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+def _labels(labels):
+    if not labels: return ""
+    esc = lambda v: str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in labels) + "}"
+
+class Histogram:
+    def __init__(self, buckets=STAGE_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-th observation
+        with self.lock: counts, total = list(self.counts), self.count
+        if not total: return 0.0
+        target, seen = q * total, 0
+        for i, c in enumerate(counts):
+            seen += c
+            if seen >= target: return self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+        return self.buckets[-1]
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}   # (name, labels) -> Histogram
+        self.counters = {}     # (name, labels) -> float
+        self.gauges = {}       # (name, labels) -> callable
+        self.help = {}
+
+    def describe(self, name, text): self.help[name] = text
+
+    def histogram(self, name, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        h = self.histograms.get(key)
+        if h is None:
+            with self.lock: h = self.histograms.setdefault(key, Histogram())
+        return h
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock: self.counters[key] = self.counters.get(key, 0) + value
+
+    def gauge(self, name, fn, **labels):
+        with self.lock: self.gauges[(name, tuple(sorted(labels.items())))] = fn
+
+    @contextmanager
+    def stage(self, stage):
+        h = self.histogram('agribot_stage_seconds', stage=stage)
+        t0 = time.perf_counter()
+        try: yield
+        finally: h.observe(time.perf_counter() - t0)
+
+    def counter_value(self, name, **labels):
+        return self.counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def summary(self):
+        # Compact view for the live Socket.IO 'stats' event
+        out = {}
+        with self.lock: histograms = list(self.histograms.items())   # histogram() adds keys on first use
+        for (name, labels), h in histograms:
+            key = dict(labels).get('stage', name)
+            out[key] = {"n": h.count, "avg_ms": round(h.sum / h.count * 1000, 2) if h.count else 0,
+                        "p95_ms": round(h.quantile(0.95) * 1000, 2)}
+        return out
+
+    def render(self):
+        lines, typed = [], set()
+        def header(name, kind):
+            if name in typed: return
+            typed.add(name)
+            if name in self.help: lines.append(f"# HELP {name} {self.help[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+        with self.lock: histograms, gauges = sorted(self.histograms.items()), sorted(self.gauges.items(), key=lambda kv: kv[0])
+        for (name, labels), h in histograms:
+            header(name, 'histogram')
+            with h.lock: counts, total, s = list(h.counts), h.count, h.sum
+            cumulative = 0
+            for bound, c in zip(h.buckets + (float('inf'),), counts):
+                cumulative += c
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f"{name}_bucket{_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labels)} {s}")
+            lines.append(f"{name}_count{_labels(labels)} {total}")
+        with self.lock: counters = sorted(self.counters.items())
+        for (name, labels), value in counters:
+            header(name, 'counter')
+            lines.append(f"{name}{_labels(labels)} {value}")
+        for (name, labels), fn in gauges:
+            header(name, 'gauge')
+            try: lines.append(f"{name}{_labels(labels)} {float(fn())}")
+            except Exception: pass
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,217 @@
+import json
+import os
+import queue
+import threading
+import time
+import numpy as np
+from vision import TensorPreprocessor, dequantize
+from backends import FACTORIES
+from metrics import Histogram
+
+# Model registry. A model is loaded together with its manifest (class labels,
+# which class is "healthy", per-class display text) and warmed up with a few
+# invokes before it can go live. Activating a model is one reference swap, so
+# a scan already running finishes on the model it started with and nothing
+# queued is dropped. An optional shadow model sees the same frames off the
+# request path and is scored on how often it agrees with the live one.
+#
+# Manifest: <model path without extension>.json, or model.manifest in config
+#   {"name": "tomato_v3_int8", "version": "3", "classes": [...],
+#    "healthy": "Tomato___healthy", "info": {"<class>": {"name", "cause", "sol", "link"}}}
+
+WARMUP_INVOKES = 3
+UNKNOWN_INFO = {"name": "অজানা রোগ", "cause": "শনাক্ত করা যায়নি", "sol": "পরামর্শ নিন", "link": "#"}
+
+class ModelExists(ValueError):
+    # Names key the registry and the per-model histograms, so they must stay unique
+    pass
+
+def load_manifest(cfg, default_classes, default_info=None):
+    # -> {"name", "version", "classes", "healthy", "info"}; missing fields fall back to the built-in labels
+    path = cfg.get('manifest') or (os.path.splitext(cfg['path'])[0] + '.json' if cfg.get('path') else None)
+    manifest = {}
+    if path and os.path.exists(path):
+        with open(path) as f: manifest = json.load(f)
+    classes = list(manifest.get('classes') or default_classes)
+    healthy = manifest.get('healthy') or next((c for c in classes if 'healthy' in c.lower()), None)
+    if healthy not in classes: raise ValueError(f"manifest {path} must name its healthy class")
+    info = {c: (default_info or {}).get(c, UNKNOWN_INFO) for c in classes}
+    info.update(manifest.get('info', {}))
+    name = cfg.get('name') or manifest.get('name') or os.path.splitext(os.path.basename(cfg.get('path') or cfg['backend']))[0]
+    return {"name": name, "version": str(manifest.get('version', '')), "classes": classes, "healthy": healthy, "info": info}
+
+class Model:
+    def __init__(self, interpreter, manifest, cfg, histogram=None):
+        self.interpreter = interpreter
+        self.cfg = cfg
+        self.name = manifest['name']
+        self.version = manifest['version']
+        self.classes = manifest['classes']
+        self.healthy = self.classes.index(manifest['healthy'])
+        self.meta = manifest['info']
+        self.lock = threading.Lock()   # one invoke at a time per interpreter
+        self.latency = histogram or Histogram()
+        self.batch = 1
+        self.input_details = interpreter.get_input_details()
+        self.output_details = interpreter.get_output_details()
+        self.preprocessors = {1: TensorPreprocessor(self.input_details[0])}
+        self.preprocess = self.preprocessors[1]
+        self.loaded_at = time.time()
+        self.warmup_ms = 0.0
+        outputs = int(np.prod(self.output_details[0]['shape'][1:]))
+        if outputs != len(self.classes): raise ValueError(f"{self.name}: {outputs} outputs but {len(self.classes)} classes")
+
+    @property
+    def input_size(self): return int(self.input_details[0]['shape'][1])
+
+    def info(self, idx): return self.meta.get(self.classes[idx], UNKNOWN_INFO)
+
+    def use_batch(self, n):
+        # Resize the input tensor to n images; False if the model has a fixed batch
+        if self.batch == n: return True
+        index = self.input_details[0]['index']
+        shape = [n] + [int(v) for v in self.input_details[0]['shape'][1:]]
+        try:
+            self.interpreter.resize_tensor_input(index, shape)
+            self.interpreter.allocate_tensors()
+        except Exception as e:
+            print(f"⚠️ {self.name}: batch {n} not supported: {e}")
+            self.interpreter.resize_tensor_input(index, [1] + shape[1:])
+            self.interpreter.allocate_tensors()
+            n = 1
+        self.batch = n
+        self.input_details = self.interpreter.get_input_details()
+        self.output_details = self.interpreter.get_output_details()
+        if n not in self.preprocessors: self.preprocessors[n] = TensorPreprocessor(self.input_details[0])
+        self.preprocess = self.preprocessors[n]
+        return self.batch == shape[0]
+
+    def invoke(self, tensor):
+        # Caller holds self.lock; returns the output batch as real scores (uint8 outputs dequantized)
+        t0 = time.perf_counter()
+        self.interpreter.set_tensor(self.input_details[0]['index'], tensor)
+        self.interpreter.invoke()
+        out = dequantize(self.interpreter.get_tensor(self.output_details[0]['index']), self.output_details[0])
+        self.latency.observe(time.perf_counter() - t0)
+        return out
+
+    def classify(self, array):
+        # -> (probabilities, model-input RGB copy) for one XRGB frame
+        with self.lock:
+            self.use_batch(1)
+            out = self.invoke(self.preprocess(array))
+            return np.array(out[0], dtype=np.float32), self.preprocess.rgb.copy()
+
+    def warm_up(self, n=WARMUP_INVOKES):
+        # First invokes pay for delegate setup and cold caches; keep them off live requests
+        with self.lock:
+            self.use_batch(1)
+            blank = np.zeros((self.input_size, self.input_size, 4), np.uint8)
+            t0 = time.perf_counter()
+            for _ in range(n): self.interpreter.set_tensor(self.input_details[0]['index'], self.preprocess(blank)); self.interpreter.invoke()
+            self.warmup_ms = round((time.perf_counter() - t0) * 1000 / max(n, 1), 2)
+
+    def stats(self):
+        h = self.latency
+        return {"name": self.name, "version": self.version, "backend": self.cfg.get('backend'), "path": self.cfg.get('path'),
+                "classes": len(self.classes), "invokes": h.count, "avg_ms": round(h.sum / h.count * 1000, 2) if h.count else 0,
+                "p95_ms": round(h.quantile(0.95) * 1000, 2), "warmup_ms": self.warmup_ms}
+
+class ModelRegistry:
+    def __init__(self, default_classes, default_info=None, histogram=None):
+        self.default_classes = default_classes
+        self.default_info = default_info
+        self.histogram = histogram or (lambda name: Histogram())   # fn(model name) -> Histogram
+        self.lock = threading.Lock()
+        self.models = {}
+        self.loading = {}       # name -> "loading" | error text
+        self.active = None
+        self.shadow = None
+        self.shadow_queue = queue.Queue(maxsize=2)
+        self.shadow_stats = {"compared": 0, "agreed": 0, "skipped": 0}
+        self.listeners = []     # fn(event, model name)
+        threading.Thread(target=self._shadow_loop, daemon=True).start()
+
+    # --- Loading ---
+    def add(self, interpreter, cfg, manifest=None):
+        manifest = manifest or load_manifest(cfg, self.default_classes, self.default_info)
+        model = Model(interpreter, manifest, cfg, self.histogram(manifest['name']))
+        model.warm_up()
+        with self.lock:
+            if model.name in self.models: raise ModelExists(f"model {model.name} is already loaded")
+            self.models[model.name] = model
+        return model
+
+    def load(self, cfg, activate=False):
+        # Opens and warms up a model on a background thread; the live model keeps
+        # serving. A bad manifest raises here, before anything is started.
+        manifest = load_manifest(cfg, self.default_classes, self.default_info)
+        name = manifest['name']
+        with self.lock:
+            if name in self.models or self.loading.get(name) == "loading":
+                raise ModelExists(f"model {name} is already {'loaded' if name in self.models else 'loading'}; give it a new name")
+            self.loading[name] = "loading"
+        def work():
+            try:
+                model = self.add(FACTORIES['model'][cfg['backend']](cfg), cfg, manifest)
+                with self.lock: self.loading.pop(name, None)
+                self._notify('loaded', model.name)
+                if activate: self.activate(model.name)
+            except Exception as e:
+                with self.lock: self.loading[name] = f"failed: {e}"
+                self._notify('failed', name)
+        threading.Thread(target=work, daemon=True).start()
+        return name
+
+    def activate(self, name):
+        with self.lock:
+            model = self.models[name]
+            self.active = model
+            if self.shadow is model: self.shadow = None
+        self._notify('active', name)
+        return model
+
+    def set_shadow(self, name=None):
+        with self.lock:
+            self.shadow = self.models[name] if name else None
+            self.shadow_stats = {"compared": 0, "agreed": 0, "skipped": 0}
+
+    def unload(self, name):
+        with self.lock:
+            model = self.models.get(name)
+            if model is None or model is self.active: return False
+            if model is self.shadow: self.shadow = None
+            del self.models[name]
+            return True
+
+    def _notify(self, event, name):
+        for fn in list(self.listeners): fn(event, name)
+
+    # --- A/B shadow ---
+    def offer_shadow(self, array, model, probs):
+        # Queue a frame the live model just classified; dropped if the shadow is behind
+        shadow = self.shadow
+        if shadow is None or shadow is model: return
+        try: self.shadow_queue.put_nowait((shadow, array, model.classes[int(np.argmax(probs))]))
+        except queue.Full: self.shadow_stats['skipped'] += 1
+
+    def _shadow_loop(self):
+        while True:
+            shadow, array, live_class = self.shadow_queue.get()
+            try:
+                probs, _ = shadow.classify(array)
+            except Exception as e:
+                print(f"⚠️ Shadow Error ({shadow.name}): {e}")
+                continue
+            with self.lock:
+                if shadow is not self.shadow: continue
+                self.shadow_stats['compared'] += 1
+                self.shadow_stats['agreed'] += shadow.classes[int(np.argmax(probs))] == live_class
+
+    def status(self):
+        with self.lock:
+            models, active, shadow = list(self.models.values()), self.active, self.shadow
+            loading, ab = dict(self.loading), dict(self.shadow_stats)
+        if ab['compared']: ab['agreement'] = round(ab['agreed'] / ab['compared'], 4)
+        return {"active": active.name if active else None, "shadow": shadow.name if shadow else None,
+                "shadow_stats": ab, "loading": loading, "models": [m.stats() for m in models]}
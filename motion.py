@@ -0,0 +1,89 @@
+import os
+import re
+import numpy as np
+
+# Arm recordings as compact (time, channel, angle) arrays. Each recording is a
+# single .npy file, so it loads memory-mapped and instantly however long the
+# field routine is; playback resamples it at a fixed control rate.
+
+MOTION_DTYPE = np.dtype([('t', '<f4'), ('ch', 'u1'), ('ang', 'u1')])
+
+def to_motion(steps):
+    # steps: [(seconds since start, channel, angle), ...]
+    rec = np.array([(t, ch, max(0, min(180, int(ang)))) for t, ch, ang in steps], dtype=MOTION_DTYPE)
+    if len(rec): rec['t'] -= rec['t'][0]
+    return rec
+
+def _rdp(t, a, tolerance):
+    # Ramer-Douglas-Peucker on one channel's (time, angle) curve; returns kept indices
+    keep = np.zeros(len(t), dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(t) - 1)]
+    while stack:
+        lo, hi = stack.pop()
+        if hi - lo < 2: continue
+        span = t[hi] - t[lo]
+        seg = slice(lo + 1, hi)
+        if span > 0: line = a[lo] + (a[hi] - a[lo]) * (t[seg] - t[lo]) / span
+        else: line = np.full(hi - lo - 1, a[lo])
+        err = np.abs(a[seg] - line)
+        i = int(np.argmax(err))
+        if err[i] > tolerance:
+            mid = lo + 1 + i
+            keep[mid] = True
+            stack.append((lo, mid)); stack.append((mid, hi))
+    return np.flatnonzero(keep)
+
+def simplify(rec, tolerance=1.0):
+    # Drop points that linear interpolation reproduces within `tolerance` degrees
+    kept = []
+    for ch in np.unique(rec['ch']):
+        idx = np.flatnonzero(rec['ch'] == ch)
+        sub = rec[idx]
+        kept.append(idx[_rdp(sub['t'].astype(np.float64), sub['ang'].astype(np.float64), tolerance)])
+    if not kept: return rec[:0].copy()
+    return rec[np.sort(np.concatenate(kept))].copy()
+
+def resample(rec, rate):
+    # -> (tick times, channels, angles[channel, tick]); -1 before a channel's first point
+    duration = float(rec['t'].max()) if len(rec) else 0.0
+    ticks = np.arange(0.0, duration + 1.0 / rate, 1.0 / rate)
+    channels = [int(c) for c in np.unique(rec['ch'])]
+    angles = np.full((len(channels), len(ticks)), -1, dtype=np.int16)
+    for row, ch in enumerate(channels):
+        sub = rec[rec['ch'] == ch]
+        live = ticks >= sub['t'][0]
+        angles[row, live] = np.rint(np.interp(ticks[live], sub['t'], sub['ang']))
+    return ticks, channels, angles
+
+class MotionLibrary:
+    def __init__(self, root):
+        self.root = root
+
+    def _path(self, name):
+        safe = re.sub(r'[^A-Za-z0-9_-]', '_', name).strip('_') or 'recording'
+        return os.path.join(self.root, safe + '.npy'), safe
+
+    def save(self, name, rec):
+        os.makedirs(self.root, exist_ok=True)
+        path, safe = self._path(name)
+        np.save(path, np.ascontiguousarray(rec, dtype=MOTION_DTYPE))
+        return safe
+
+    def load(self, name):
+        path, _ = self._path(name)
+        if not os.path.exists(path): return None
+        return np.load(path, mmap_mode='r')
+
+    def delete(self, name):
+        path, _ = self._path(name)
+        if os.path.exists(path): os.remove(path)
+
+    def list(self):
+        if not os.path.isdir(self.root): return []
+        items = []
+        for fn in sorted(os.listdir(self.root)):
+            if not fn.endswith('.npy'): continue
+            rec = np.load(os.path.join(self.root, fn), mmap_mode='r')
+            items.append({"name": fn[:-4], "points": len(rec), "duration": round(float(rec['t'].max()), 2) if len(rec) else 0})
+        return items
@@ -0,0 +1,124 @@
+import time
+
+# Framed binary link to the Arduino, spoken alongside the original ASCII
+# commands. The sketch's ASCII commands are all 7-bit, so a leading SYNC byte
+# (0xA5) is enough to tell a frame from a `ch,angle\n` line or a car letter.
+#
+#   SYNC | LEN | TYPE | SEQ | payload (LEN - 2 bytes) | CRC-8 of LEN..payload
+#
+# Every host frame is answered with an ACK carrying its SEQ, so the writer can
+# measure round trips and resend what was lost. Once HELLO is acked the sketch
+# takes frames only and drops any other byte, so a frame body that lost sync
+# can never be read as a car command. Keep in sync with arduno_code.ino.
+
+SYNC = 0xA5
+MAX_PAYLOAD = 16
+
+# host -> Arduino
+T_POSE = 0x81       # channel mask, then one angle per set bit (channels 0..7)
+T_PUMP = 0x82       # 0 = off, 1 = on
+T_REQUEST = 0x83    # REQ_DISTANCE | REQ_SOIL
+T_CAR = 0x84        # car / mode letters ('w', 'x', 'U', ...)
+T_HELLO = 0x85      # baud code; acked at the old rate, then both sides switch
+T_PING = 0x86
+T_SERVO = 0x87      # channel, angle for channels outside the pose mask
+# Arduino -> host
+T_ACK = 0xC0        # status
+T_DISTANCE = 0xC1   # uint16 cm, little endian
+
+ACK_OK, ACK_BAD_CRC, ACK_UNKNOWN = 0, 1, 2
+REQ_DISTANCE, REQ_SOIL = 0, 1
+BAUD_CODES = {9600: 1, 19200: 2, 38400: 3, 57600: 4, 115200: 5}
+BAUD_RATES = {code: baud for baud, code in BAUD_CODES.items()}
+
+def _crc_table():
+    table = []
+    for i in range(256):
+        crc = i
+        for _ in range(8): crc = ((crc << 1) ^ 0x07) & 0xFF if crc & 0x80 else (crc << 1) & 0xFF
+        table.append(crc)
+    return table
+
+CRC_TABLE = _crc_table()
+
+def crc8(data):
+    # CRC-8, polynomial 0x07 (the sketch computes it bitwise)
+    crc = 0
+    for b in data: crc = CRC_TABLE[crc ^ b]
+    return crc
+
+def encode(kind, seq, payload=b''):
+    body = bytes([len(payload) + 2, kind, seq & 0xFF]) + bytes(payload)
+    return bytes([SYNC]) + body + bytes([crc8(body)])
+
+def pose_payload(pose):
+    # {channel: angle} -> mask + angles in channel order
+    mask, angles = 0, []
+    for ch in sorted(pose):
+        mask |= 1 << ch
+        angles.append(max(0, min(180, int(pose[ch]))))
+    return bytes([mask] + angles)
+
+def decode_pose(payload):
+    mask, angles = payload[0], iter(payload[1:])
+    return {ch: next(angles) for ch in range(8) if mask & (1 << ch)}
+
+class FrameParser:
+    # Splits the Arduino's output into text lines and binary frames
+    def __init__(self):
+        self.buf = bytearray()
+        self.errors = 0
+
+    def feed(self, data):
+        # -> [('line', text) | ('frame', type, seq, payload), ...]
+        self.buf += data
+        out = []
+        while self.buf:
+            if self.buf[0] == SYNC:
+                if len(self.buf) < 2: break
+                length = self.buf[1]
+                if not 2 <= length <= MAX_PAYLOAD + 2:
+                    self.errors += 1; del self.buf[0]; continue
+                if len(self.buf) < length + 3: break
+                frame = bytes(self.buf[:length + 3])
+                if crc8(frame[1:-1]) != frame[-1]:
+                    self.errors += 1; del self.buf[0]; continue
+                del self.buf[:length + 3]
+                out.append(('frame', frame[2], frame[3], frame[4:-1]))
+            else:
+                end = self.buf.find(b'\n')
+                sync = self.buf.find(bytes([SYNC]))
+                if sync != -1 and (end == -1 or sync < end): end = sync - 1
+                elif end == -1: break
+                line = self.buf[:end + 1].decode(errors='ignore').strip()
+                del self.buf[:end + 1]
+                if line: out.append(('line', line))
+        return out
+
+def _exchange(conn, parser, frame, seq, timeout):
+    # Write one frame and wait for its ACK -> status, or None on timeout
+    conn.reset_input_buffer()
+    conn.write(frame); conn.flush()
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        for event in parser.feed(conn.read(conn.in_waiting or 1)):
+            if event[0] == 'frame' and event[1] == T_ACK and event[2] == seq: return event[3][0]
+    return None
+
+def negotiate(conn, baud, timeout=0.3):
+    # -> (binary supported, link baud). Firmware without the framed protocol
+    # ignores HELLO (none of its bytes is an ASCII command), so we stay on ASCII.
+    parser = FrameParser()
+    code = BAUD_CODES.get(baud, BAUD_CODES.get(conn.baudrate, 1))
+    status = _exchange(conn, parser, encode(T_HELLO, 0, bytes([code])), 0, timeout)
+    if status is None: return False, conn.baudrate
+    if status != ACK_OK or BAUD_RATES[code] == conn.baudrate: return True, conn.baudrate
+    old = conn.baudrate
+    time.sleep(0.02)   # the sketch switches once its ACK has drained
+    conn.baudrate = BAUD_RATES[code]
+    for seq in (1, 2, 3):
+        if _exchange(conn, parser, encode(T_PING, seq), seq, timeout) is not None: return True, conn.baudrate
+    # No answer at the new rate: the sketch falls back by itself after a second
+    conn.baudrate = old
+    time.sleep(1.2)
+    return _exchange(conn, parser, encode(T_PING, 4), 4, timeout) is not None, old
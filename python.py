@@ -1,72 +1,70 @@
 import time
-import io
 import os
-import serial
 import numpy as np
 import threading
+import queue
+import heapq
 import cv2 
 from datetime import datetime
-from flask import Flask, render_template_string, Response, request, jsonify, render_template
+from collections import OrderedDict
+from flask import Flask, render_template_string, Response, request, jsonify, render_template, send_file
 from flask_socketio import SocketIO
-from picamera2 import Picamera2 
-from PIL import Image
+from vision import CLASSES, ColorTracker, find_targets, pixel_to_angle, plan_order, tile_origins, severity_heatmap, SceneGate, ProbabilitySmoother
+from jobs import JobRunner
+from motion import MotionLibrary, to_motion, simplify, resample
+from history import HistoryStore
+from models import ModelRegistry, ModelExists
+from metrics import Registry
+from state import StateBroadcaster
+from backends import load_config, Backends, FACTORIES
+from protocol import FrameParser, encode, negotiate, pose_payload, T_POSE, T_PUMP, T_REQUEST, T_CAR, T_SERVO, T_ACK, T_DISTANCE, ACK_OK, ACK_BAD_CRC, REQ_DISTANCE, REQ_SOIL
 
-# --- 1. AI Laibary Setup---
-try:
-    import tflite_runtime.interpreter as tflite
-except ImportError:
-    try:
-        import tensorflow.lite as tflite
-    except:
-        print("⚠️ AI Library Not Found!")
-        tflite = None
-
-# --- 2. Arduno Connection---
-SERIAL_PORT = '/dev/ttyACM0' 
-BAUD_RATE = 9600
-arduino = None
-
-try:
-    arduino = serial.Serial(SERIAL_PORT, BAUD_RATE, timeout=1)
-    time.sleep(2)
-    print(f"✅ Connected to Arduino on {SERIAL_PORT}")
-except:
-    try:
-        arduino = serial.Serial('/dev/ttyUSB0', BAUD_RATE, timeout=1)
-        print("✅ Connected to Arduino on /dev/ttyUSB0")
-    except:
-        print("⚠️ WARNING: Arduino not connected! Check Port.")
-
-# --- 3. Camera Setup ---
-try:
-    picam2 = Picamera2()
-    config = picam2.create_preview_configuration(main={"size": (640, 480), "format": "XRGB8888"})
-    picam2.configure(config)
-    picam2.start()
-    print("✅ Picamera2 Started Successfully")
-except Exception as e:
-    print(f"❌ Camera Error: {e}")
-
-# --- 4.Model Load ---
-model_path = "/home/bluefox/tomato_model_v2.tflite"
-interpreter = None
-if tflite and os.path.exists(model_path):
-    interpreter = tflite.Interpreter(model_path=model_path)
-    interpreter.allocate_tensors()
-    input_details = interpreter.get_input_details()
-    output_details = interpreter.get_output_details()
-    print("✅ AI Model Loaded!")
+# --- 1. Config & Hardware Backends ---
+# Camera, Arduino and model are opened in parallel on background threads by
+# named backend factories (real, file replay, simulator; see backends.py), so
+# the web UI is up at once and reports readiness as each one arrives.
+config = load_config()
+hardware = Backends(config)
+arduino = None           # serial connection, set when the serial backend is ready
+CAMERA_TIMEOUT = 5       # seconds a capture waits for a camera that is still starting
+
+def capture_array():
+    cam = hardware.wait('camera', CAMERA_TIMEOUT)
+    if cam is None: raise RuntimeError(f"Camera not available ({hardware.ready().get('camera', {}).get('state', 'starting')})")
+    return cam.capture_array()
+
+# --- 2. Model Load ---
+# The interpreter is registered with the model registry (section 9.3), which
+# warms it up and serializes every invoke behind its lock.
+INFER_QUEUE_SIZE = 4     # pending scan jobs before /predict answers "busy"
+COALESCE_WINDOW = 0.05   # scans arriving within this window share one frame
+HISTORY_RETENTION_DAYS = None   # e.g. 90 to prune older scans automatically (off: /history/prune only)
+HISTORY_MAX_SCANS = None        # e.g. 20000 to cap the automatic history size
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'secret'
 socketio = SocketIO(app, cors_allowed_origins="*")
+metrics = Registry()
+STATS_INTERVAL = 2   # seconds between live 'stats' events
+UI_STATE_HZ = 20     # cap on 'state' messages per second
+
+def emit_state(event, data):
+    socketio.emit(event, data)
+    metrics.inc('agribot_ui_messages_total')
+
+# Sliders, car, pump and status line: every browser sees the same state, batched per tick
+ui_state = StateBroadcaster(emit_state, {"Base": 90, "Shoulder": 90, "Elbow": 90, "Gripper": 130,
+                                         "pump": False, "car": "stop", "mode": "manual", "status": "Ready...", "soil": None}, UI_STATE_HZ)
 
 # --- Global Variable ---
-recorded_steps = []
-is_recording = False
-is_playing = False 
-is_tracking = False 
+recording_steps = None   # [(t, ch, ang), ...] while REC is on
+current_recording = None # motion array to play (last recorded or loaded)
+jobs = JobRunner()   # the one harvest/playback job allowed at a time
 start_record_time = 0
+RECORDINGS_DIR = "Recordings"
+RECORD_SIMPLIFY = 1.0    # degrees; drop points interpolation reproduces (0 = keep all)
+PLAYBACK_HZ = 20
+motion_library = MotionLibrary(RECORDINGS_DIR)
 
 # Harvest Position
 target_color = 'RED'
@@ -75,29 +73,20 @@ current_shoulder = 90
 current_elbow = 90
 
 # --- 5. Disease Info ---
+# Built-in text per class name; a model's manifest can override or extend it
 DISEASE_INFO = {
-    0: {"name": "ব্যাকটেরিয়াল স্পট (Bacterial Spot)", "cause": "ব্যাকটেরিয়া...", "sol": "কপার অক্সিক্লোরাইড স্প্রে করুন।", "link": "bacterial_spot"},
-    1: {"name": "আগাম ধসা রোগ (Early Blight)", "cause": "ছত্রাকজনিত...", "sol": "ম্যানকোজেব স্প্রে করুন।", "link": "early_blight"},
-    2: {"name": "নাবি ধসা রোগ (Late Blight)", "cause": "ছত্রাকজনিত...", "sol": "মেলোডি ডুও স্প্রে করুন।", "link": "late_blight"},
-    3: {"name": "লিফ মোল্ড (Leaf Mold)", "cause": "ছত্রাকজনিত...", "sol": "কার্বেন্ডাজিম স্প্রে করুন।", "link": "leaf_mold"},
-    4: {"name": "সেপ্টোরিয়া লিফ স্পট (Septoria)", "cause": "ছত্রাকজনিত...", "sol": "সুমিথিয়ন স্প্রে করুন।", "link": "septoria"},
-    5: {"name": "মাকড়সার আক্রমণ (Spider Mites)", "cause": "লাল মাকড়সা...", "sol": "ভার্টিমেক স্প্রে করুন।", "link": "spider_mites"},
-    6: {"name": "টার্গেট স্পট (Target Spot)", "cause": "ছত্রাকজনিত...", "sol": "এমিস্টার টপ ব্যবহার করুন।", "link": "target_spot"},
-    7: {"name": "পাতা কোঁকড়ানো ভাইরাস (Yellow Leaf Curl)", "cause": "সাদা মাছি...", "sol": "ইমিডাক্লোরোপ্রিড স্প্রে করুন।", "link": "yellow_curl"},
-    8: {"name": "মোজাইক ভাইরাস (Mosaic Virus)", "cause": "ভাইরাস...", "sol": "আক্রান্ত গাছ তুলে ফেলুন।", "link": "mosaic_virus"},
-    9: {"name": "সুস্থ গাছ (Healthy)", "cause": "গাছ ভালো আছে।", "sol": "নিয়মিত পানি দিন।", "link": "healthy"}
+    "Tomato___Bacterial_spot": {"name": "ব্যাকটেরিয়াল স্পট (Bacterial Spot)", "cause": "ব্যাকটেরিয়া...", "sol": "কপার অক্সিক্লোরাইড স্প্রে করুন।", "link": "bacterial_spot"},
+    "Tomato___Early_blight": {"name": "আগাম ধসা রোগ (Early Blight)", "cause": "ছত্রাকজনিত...", "sol": "ম্যানকোজেব স্প্রে করুন।", "link": "early_blight"},
+    "Tomato___Late_blight": {"name": "নাবি ধসা রোগ (Late Blight)", "cause": "ছত্রাকজনিত...", "sol": "মেলোডি ডুও স্প্রে করুন।", "link": "late_blight"},
+    "Tomato___Leaf_Mold": {"name": "লিফ মোল্ড (Leaf Mold)", "cause": "ছত্রাকজনিত...", "sol": "কার্বেন্ডাজিম স্প্রে করুন।", "link": "leaf_mold"},
+    "Tomato___Septoria_leaf_spot": {"name": "সেপ্টোরিয়া লিফ স্পট (Septoria)", "cause": "ছত্রাকজনিত...", "sol": "সুমিথিয়ন স্প্রে করুন।", "link": "septoria"},
+    "Tomato___Spider_mites Two-spotted_spider_mite": {"name": "মাকড়সার আক্রমণ (Spider Mites)", "cause": "লাল মাকড়সা...", "sol": "ভার্টিমেক স্প্রে করুন।", "link": "spider_mites"},
+    "Tomato___Target_Spot": {"name": "টার্গেট স্পট (Target Spot)", "cause": "ছত্রাকজনিত...", "sol": "এমিস্টার টপ ব্যবহার করুন।", "link": "target_spot"},
+    "Tomato___Tomato_Yellow_Leaf_Curl_Virus": {"name": "পাতা কোঁকড়ানো ভাইরাস (Yellow Leaf Curl)", "cause": "সাদা মাছি...", "sol": "ইমিডাক্লোরোপ্রিড স্প্রে করুন।", "link": "yellow_curl"},
+    "Tomato___Tomato_mosaic_virus": {"name": "মোজাইক ভাইরাস (Mosaic Virus)", "cause": "ভাইরাস...", "sol": "আক্রান্ত গাছ তুলে ফেলুন।", "link": "mosaic_virus"},
+    "Tomato___healthy": {"name": "সুস্থ গাছ (Healthy)", "cause": "গাছ ভালো আছে।", "sol": "নিয়মিত পানি দিন।", "link": "healthy"}
 }
 
-# --- 6. Smart Sleep ---
-def smart_sleep(duration):
-    global is_playing, is_tracking
-    end_time = time.time() + duration
-    while time.time() < end_time:
-        if not is_playing and not is_tracking: 
-            return False 
-        time.sleep(0.1) 
-    return True
-
 # --- 7. Web Insterface ---
 HTML_CODE = """
 <!DOCTYPE html>
@@ -197,8 +186,12 @@ HTML_CODE = """
     <h3>🚜 Smart Agro-Bot(UIU)</h3>
     
     <div class="top-container">
-        <div class="video-box"><img src="{{ url_for('video_feed') }}"></div>
+        <div class="video-box"><img id="cam" src="{{ url_for('video_feed', adaptive=1) }}"></div>
         <button class="scan" onclick="scanDisease()">📸 স্ক্যান করুন (AI)</button>
+        <button class="scan" onclick="scanDisease('tiles')" style="background:#8e24aa;">🗺️ পুরো ছবি স্ক্যান (Heatmap)</button>
+        <button class="scan" id="btnMon" onclick="toggleMonitor()" style="background:#00897b;">👁️ নজরদারি চালু (Monitor)</button>
+        <p id="monitor" style="font-size:10px; margin:0; color:#00695c;"></p>
+        <button id="btnWs" onclick="toggleWs()" style="background:#546e7a; width:100%; font-size:10px;">⚡ Low-latency video: OFF</button>
         
         <div id="result-box">
             <div id="d-name">...</div>
@@ -206,6 +199,10 @@ HTML_CODE = """
             <hr>
             <b>⚠️ কারণ:</b> <span id="d-cause">...</span><br>
             <b>💊 সমাধান:</b> <span id="d-sol">...</span><br>
+            <div id="d-tiles" style="display:none;">
+                <b>🗺️ আক্রান্ত টাইল:</b> <span id="d-sev">0</span><br>
+                <img id="d-heat" style="width:100%; margin-top:3px;">
+            </div>
             <div style="text-align:center; margin-top:5px;">
                 <a id="d-link" href="#" target="_blank" style="color:#4fc3f7;">বিস্তারিত দেখুন</a>
                 <button onclick="document.getElementById('result-box').style.display='none'" style="background:red; width:50px; float:right;">X</button>
@@ -231,6 +228,8 @@ HTML_CODE = """
                 <button class="go" onclick="sendCar('s')">▼</button>
             </div>
             <p id="status" style="font-size:11px; margin-top:5px; font-weight:bold;">Ready...</p>
+            <p id="hw" style="font-size:9px; margin:0; color:#555;"></p>
+            <p id="stats" style="font-size:9px; margin:0; color:#555;"></p>
         </div>
 
         <div class="col-right">
@@ -265,6 +264,7 @@ HTML_CODE = """
                 <button onclick="playLoop()" style="background:#66bb6a;">↻ Loop</button>
                 <button onclick="stopPlay()" style="background:#ef5350;">■ STOP</button>
             </div>
+            <select id="recSel" style="width:100%; margin-top:3px; font-size:10px;"></select>
         </div>
     </div>
 
@@ -272,21 +272,63 @@ HTML_CODE = """
         var socket = io();
         var recording = false;
         
-        socket.on('status_msg', function(msg) { document.getElementById("status").innerText = msg; });
-        socket.on('update_ui', function(data) { document.getElementById(data.id).value = data.val; document.getElementById("v_" + data.id).innerText = data.val; });
+        socket.on('ready', function(d) {
+            var waiting = [];
+            for (var k in d) { if (d[k].state !== 'ready') waiting.push((d[k].state === 'starting' ? "⏳ " : "⚠️ ") + k + " " + d[k].state); }
+            document.getElementById("status").innerText = waiting.length ? waiting.join(" | ") : "Ready ✅";
+        });
+        socket.on('stats', function(d) {
+            var st = d.stages, ms = function(k) { return st[k] ? st[k].avg_ms : '-'; };
+            document.getElementById("stats").innerText = "📷 " + d.fps + " fps | cap " + ms('capture') + " | enc " + ms('encode') + " | AI " + ms('invoke') + " ms | serial q" + d.serial_depth;
+        });
+        var hw = {};
+        socket.on('state', function(d) {
+            ['Base', 'Shoulder', 'Elbow', 'Gripper'].forEach(function(k) {
+                var el = document.getElementById(k);
+                if (d[k] === undefined || document.activeElement === el) return;   // don't fight a drag
+                el.value = d[k]; document.getElementById("v_" + k).innerText = d[k];
+            });
+            if (d.status !== undefined) document.getElementById("status").innerText = d.status;
+            if (d.soil !== undefined && d.soil !== null && d.status === undefined) document.getElementById("status").innerText = "🌱 Soil: " + d.soil;
+            ['car', 'mode', 'pump'].forEach(function(k) { if (d[k] !== undefined) hw[k] = d[k]; });
+            document.getElementById("hw").innerText = "🚗 " + hw.car + " (" + hw.mode + ") | 💧 pump " + (hw.pump ? "ON" : "off");
+        });
 
         function sendArm(el) { document.getElementById("v_" + el.id).innerText = el.value; socket.emit('move', {id: el.id, val: el.value}); }
         function checkSoil() { document.getElementById("status").innerText = "Checking soil..."; socket.emit('check_sensor'); }
         function pumpCtrl(val) { socket.emit('move', {id: 'Pump', val: val}); }
         function harvest(color) { socket.emit('harvest_request', color); }
         
+        var wsVideo = false, camUrl = null;
+        function toggleWs() {
+            var cam = document.getElementById("cam"), btn = document.getElementById("btnWs");
+            wsVideo = !wsVideo;
+            if (wsVideo) { cam.src = ""; socket.emit('stream_start', {adaptive: true}); btn.innerText = "⚡ Low-latency video: ON"; }
+            else { socket.emit('stream_stop'); cam.src = "{{ url_for('video_feed', adaptive=1) }}"; btn.innerText = "⚡ Low-latency video: OFF"; }
+        }
+        socket.on('frame', function(data, ack) {
+            if (wsVideo) {
+                var url = URL.createObjectURL(new Blob([data.jpeg], {type: "image/jpeg"}));
+                var cam = document.getElementById("cam");
+                cam.onload = function() { if (camUrl) URL.revokeObjectURL(camUrl); camUrl = url; if (ack) ack(); };
+                cam.src = url;
+            } else if (ack) ack();
+        });
+
         function toggleRec() {
             var btn = document.getElementById("btnRec");
             if (!recording) { recording = true; btn.innerText = "■ STOP"; socket.emit('rec_ctrl', 'start'); } 
             else { recording = false; btn.innerText = "● REC"; socket.emit('rec_ctrl', 'stop'); }
         }
-        function playOnce() { socket.emit('play_ctrl', 'once'); }
-        function playLoop() { socket.emit('play_ctrl', 'loop'); }
+        function playOnce() { socket.emit('play_ctrl', {cmd: 'once', name: document.getElementById("recSel").value}); }
+        function playLoop() { socket.emit('play_ctrl', {cmd: 'loop', name: document.getElementById("recSel").value}); }
+        socket.on('connect', function() { socket.emit('list_recordings'); });
+        socket.on('recordings', function(data) {
+            var sel = document.getElementById("recSel"), keep = data.current || sel.value;
+            sel.innerHTML = "";
+            data.items.forEach(function(r) { var o = document.createElement("option"); o.value = r.name; o.text = r.name + " (" + r.duration + "s)"; sel.appendChild(o); });
+            if (keep) sel.value = keep;
+        });
         function stopPlay() { socket.emit('play_ctrl', 'stop'); }
         function goHome() { socket.emit('go_home'); }
         
@@ -301,186 +343,1028 @@ HTML_CODE = """
             else if (key === "x" || key === "5" || key === " ") sendCar('x');
         });
 
-        function scanDisease() {
+        var monitorOn = false;
+        function toggleMonitor() { socket.emit('monitor_ctrl', monitorOn ? 'stop' : 'start'); }
+        socket.on('monitor', function(d) {
+            monitorOn = d.state === 'on';
+            document.getElementById('btnMon').innerText = monitorOn ? "⏹️ নজরদারি বন্ধ (Monitor)" : "👁️ নজরদারি চালু (Monitor)";
+            document.getElementById('monitor').innerText = monitorOn ? ((d.name || "...") + " " + (d.confidence || 0) + "% | AI " + d.inferred + " / skip " + d.skipped + " | 💦 " + d.sprays) : "";
+        });
+
+        var scanJob = null, scanResults = {};
+        socket.on('scan_result', function(data) {
+            scanResults[data.job] = data;
+            if (data.job === scanJob) showResult(data);
+        });
+
+        function scanDisease(mode) {
             var box = document.getElementById('result-box');
             box.style.display = 'block';
             document.getElementById('d-name').innerText = "অপেক্ষা করুন...";
-            fetch('/predict')
+            document.getElementById('d-tiles').style.display = 'none';
+            fetch('/predict/submit' + (mode ? '?mode=' + mode : ''))
             .then(res => res.json())
             .then(data => {
-                document.getElementById('d-name').innerText = data.name;
-                document.getElementById('d-acc').innerText = data.accuracy;
-                document.getElementById('d-cause').innerText = data.cause;
-                document.getElementById('d-sol').innerText = data.sol;
-                document.getElementById('d-link').href = "/" + data.link; 
-                if(data.action === "Spray") {
-                    document.getElementById('d-name').style.color = "#ff5252";
-                    alert("⚠️ রোগ ধরা পড়েছে!");
-                } else {
-                    document.getElementById('d-name').style.color = "#69f0ae";
-                }
+                if (data.job === null) { showResult(data); return; }
+                scanJob = data.job;
+                if (scanResults[scanJob]) showResult(scanResults[scanJob]);
             })
             .catch(err => { document.getElementById('d-name').innerText = "এরর!"; });
         }
+
+        function showResult(data) {
+            document.getElementById('d-name').innerText = data.name;
+            document.getElementById('d-acc').innerText = data.accuracy;
+            document.getElementById('d-cause').innerText = data.cause;
+            document.getElementById('d-sol').innerText = data.sol;
+            document.getElementById('d-link').href = "/" + data.link; 
+            if (data.heatmap) {
+                document.getElementById('d-tiles').style.display = 'block';
+                document.getElementById('d-sev').innerText = data.diseased_tiles + "/" + data.tiles + " (" + data.severity + "%)";
+                document.getElementById('d-heat').src = data.heatmap;
+            }
+            if(data.action === "Spray") {
+                document.getElementById('d-name').style.color = "#ff5252";
+                alert("⚠️ রোগ ধরা পড়েছে!");
+            } else {
+                document.getElementById('d-name').style.color = "#69f0ae";
+            }
+        }
     </script>
 </body>
 </html>
 """
 
 # --- 8. Vision Processing ---
+# Base-servo tracking runs in its own fixed-rate control loop during a harvest,
+# whether or not anyone is watching. Each tick it captures a frame, finds the
+# target and moves the base by a proportional, rate-limited step. Viewers only
+# see its latest box, drawn by process_frame_tracking().
+TRACK_HZ = 15
+TRACK_KP = 0.6            # fraction of the measured angle error corrected per tick
+TRACK_MAX_STEP = 4        # degrees per tick
+TRACK_DEADBAND = 30       # px at 640 wide (±15 px at the old 320 preview)
+TRACK_MIN_WIDTH = 40      # px at 640 wide
+CAMERA_HFOV = 62.2        # Pi camera v2 horizontal field of view, degrees
+
+class TrackingLoop:
+    def __init__(self):
+        self.overlay = None              # (x, y, w, h, frame_width) for viewers
+        self.centered = threading.Event()
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.commands = 0
+        self.ticks = 0
+
+    def start(self, job, color, box=None):
+        # box: where the target is expected, so the first search stays on it
+        self.stop()
+        self.stop_event.clear(); self.centered.clear()
+        self.commands = 0
+        self.thread = threading.Thread(target=self._loop, args=(job, color, box), daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread and self.thread is not threading.current_thread(): self.thread.join()
+        self.thread = None
+        self.overlay = None
+
+    def wait_centered(self, job, timeout): return job.wait_for(self.centered, timeout)
+
+    def _loop(self, job, color, box):
+        global current_base
+        tracker.set_color(color); tracker.reset()
+        tracker.box = box
+        period = 1.0 / TRACK_HZ
+        next_tick = time.time()
+        while job.active and not self.stop_event.is_set():
+            self.ticks += 1
+            try:
+                with metrics.stage('track_capture'):
+                    frame = cv2.cvtColor(capture_array(), cv2.COLOR_BGRA2BGR)
+                with metrics.stage('track_detect'):
+                    hit = tracker.detect(frame)
+                width = frame.shape[1]
+                if hit and hit[2] > TRACK_MIN_WIDTH * width / 640:
+                    x, y, w, h, _ = hit
+                    self.overlay = (x, y, w, h, width)
+                    error = (x + w / 2) - width / 2
+                    if abs(error) <= TRACK_DEADBAND * width / 640:
+                        self.centered.set()
+                    else:
+                        self.centered.clear()
+                        step = -TRACK_KP * error * CAMERA_HFOV / width
+                        step = max(-TRACK_MAX_STEP, min(TRACK_MAX_STEP, step))
+                        step = int(round(step)) or (1 if step > 0 else -1)
+                        new_base = max(0, min(180, current_base + step))
+                        if new_base != current_base:
+                            current_base = new_base
+                            send_arduino(0, current_base)
+                            self.commands += 1
+                else:
+                    self.overlay = None
+                    self.centered.clear()
+            except Exception as e:
+                metrics.inc('agribot_exceptions_total', source='tracking')
+                print(f"⚠️ Tracking Error: {e}")
+            next_tick += period
+            delay = next_tick - time.time()
+            if delay < 0: next_tick = time.time(); delay = 0
+            if self.stop_event.wait(delay): break
+        self.overlay = None
+
+tracker = ColorTracker(target_color)
+tracking = TrackingLoop()
+
 def process_frame_tracking(frame):
-    global current_base, is_tracking, target_color
-    if not is_tracking: return frame
-    hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
-    mask = None
-    if target_color == 'RED':
-        lower1 = np.array([0, 120, 70]); upper1 = np.array([10, 255, 255])
-        lower2 = np.array([170, 120, 70]); upper2 = np.array([180, 255, 255])
-        mask = cv2.inRange(hsv, lower1, upper1) + cv2.inRange(hsv, lower2, upper2)
-    elif target_color == 'GREEN':
-        mask = cv2.inRange(hsv, np.array([35, 50, 50]), np.array([85, 255, 255]))
-    if mask is not None:
-        contours, _ = cv2.findContours(mask, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
-        if contours:
-            largest = max(contours, key=cv2.contourArea)
-            x, y, w, h = cv2.boundingRect(largest)
-            if w > 20:
-                cv2.rectangle(frame, (x, y), (x+w, y+h), (0, 255, 0), 2)
-                cx = x + w // 2
-                center_x = 320 // 2
-                if cx < center_x - 30:
-                    current_base += 1
-                    if current_base > 180: current_base = 180
-                    send_arduino(0, current_base)
-                elif cx > center_x + 30:
-                    current_base -= 1
-                    if current_base < 0: current_base = 0
-                    send_arduino(0, current_base)
+    overlay = tracking.overlay
+    if overlay:
+        x, y, w, h, width = overlay
+        k = frame.shape[1] / width
+        cv2.rectangle(frame, (int(x * k), int(y * k)), (int((x + w) * k), int((y + h) * k)), (0, 255, 0), 2)
     return frame
 
-def gen_frames():
-    while True:
+# --- 8.1 Shared Frame Producer ---
+# One thread captures and overlays each frame once; every viewer reads the
+# latest frame, so a slow viewer skips frames instead of holding up the camera.
+# JPEGs are encoded lazily per quality level and shared by every client that
+# asked for the same level.
+STREAM_QUALITIES = (85, 70, 55, 40, 25)   # adaptive ladder; requests snap to it
+STREAM_MAX_FPS = 30
+STREAM_MIN_FPS = 2
+
+class FrameHub:
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.encode_lock = threading.Lock()
+        self.frame = None
+        self.variants = {}   # quality -> JPEG of the current frame
+        self.seq = 0
+        self.subscribers = 0
+        self.thread = None
+
+    def publish(self, frame):
+        with self.cond:
+            self.frame = frame
+            self.variants = {}
+            self.seq += 1
+            self.cond.notify_all()
+
+    def wait_next(self, last_seq, timeout=1.0):
+        with self.cond:
+            self.cond.wait_for(lambda: self.seq != last_seq, timeout)
+            return self.seq
+
+    def jpeg(self, quality):
+        # (seq, JPEG) of the newest frame at this quality
+        with self.encode_lock:
+            with self.cond: seq, frame, data = self.seq, self.frame, self.variants.get(quality)
+            if data is None and frame is not None:
+                with metrics.stage('encode'):
+                    ret, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+                data = buffer.tobytes() if ret else None
+                with self.cond:
+                    if self.seq == seq: self.variants[quality] = data
+            return seq, data
+
+    def subscribe(self):
+        with self.cond:
+            self.subscribers += 1
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._produce, daemon=True)
+                self.thread.start()
+
+    def unsubscribe(self):
+        with self.cond:
+            self.subscribers -= 1
+
+    def _produce(self):
+        while True:
+            with self.cond:
+                if self.subscribers <= 0:
+                    self.thread = None
+                    return
+            try:
+                with metrics.stage('capture'):
+                    array = capture_array()
+                with metrics.stage('convert'):
+                    frame = cv2.cvtColor(array, cv2.COLOR_RGBA2RGB)
+                    frame = cv2.resize(frame, (320, 240))
+                with metrics.stage('overlay'):
+                    frame = process_frame_tracking(frame)
+                self.publish(frame)
+                metrics.inc('agribot_frames_total')
+            except Exception as e:
+                metrics.inc('agribot_exceptions_total', source='frame')
+                print(f"⚠️ Frame Error: {e}")
+                time.sleep(0.1)
+
+frame_hub = FrameHub()
+
+# Per-viewer rate control. The time a viewer takes to absorb a frame (the
+# blocking HTTP write, or the Socket.IO ack round trip) is compared with the
+# frame budget: slow links step down the quality ladder and then the frame
+# rate, fast links climb back up.
+class StreamClient:
+    def __init__(self, fps=None, quality=None, adaptive=False):
+        self.max_fps = min(fps or STREAM_MAX_FPS, STREAM_MAX_FPS)
+        self.fps = self.max_fps
+        q = quality or STREAM_QUALITIES[1]
+        self.level = min(range(len(STREAM_QUALITIES)), key=lambda i: abs(STREAM_QUALITIES[i] - q))
+        self.adaptive = adaptive
+        self.fast = 0
+        self.next_send = 0.0
+
+    @property
+    def quality(self): return STREAM_QUALITIES[self.level]
+
+    def wait_slot(self):
+        delay = self.next_send - time.time()
+        if delay > 0: time.sleep(delay)
+        self.next_send = max(self.next_send + 1.0 / self.fps, time.time())
+
+    def feedback(self, send_seconds):
+        if not self.adaptive: return
+        budget = 1.0 / self.fps
+        if send_seconds > 0.8 * budget:
+            self.fast = 0
+            if self.level < len(STREAM_QUALITIES) - 1: self.level += 1
+            else: self.fps = max(STREAM_MIN_FPS, self.fps * 0.7)
+        elif send_seconds < 0.3 * budget:
+            self.fast += 1
+            if self.fast >= 10:
+                self.fast = 0
+                if self.fps < self.max_fps: self.fps = min(self.max_fps, self.fps * 1.25)
+                elif self.level > 0: self.level -= 1
+
+    def frames(self):
+        # Yields the newest JPEG per slot; anything older is dropped, never queued
+        frame_hub.subscribe()
+        try:
+            seq = 0
+            while True:
+                self.wait_slot()
+                new_seq = frame_hub.wait_next(seq)
+                if new_seq == seq: continue
+                new_seq, jpeg = frame_hub.jpeg(self.quality)
+                if jpeg is None: continue
+                if seq and new_seq - seq > 1: metrics.inc('agribot_frames_dropped_total', new_seq - seq - 1)
+                seq = new_seq
+                yield jpeg
+        finally:
+            frame_hub.unsubscribe()
+
+def gen_frames(client):
+    frames = client.frames()
+    try:
+        for jpeg in frames:
+            t0 = time.time()
+            yield (b'--frame\r\n' b'Content-Type: image/jpeg\r\n\r\n' + jpeg + b'\r\n')
+            client.feedback(time.time() - t0)   # resumes once the server has written the chunk
+    finally:
+        frames.close()
+
+# Optional binary transport over the existing Socket.IO connection: one frame
+# in flight per viewer, the next is only sent after the browser acks.
+STREAM_ACK_TIMEOUT = 2.0
+ws_streams = {}   # sid -> stop Event
+
+def ws_stream(sid, client, stop):
+    frames = client.frames()
+    try:
+        for jpeg in frames:
+            if stop.is_set(): break
+            acked = threading.Event()
+            t0 = time.time()
+            socketio.emit('frame', {"jpeg": jpeg, "q": client.quality, "fps": round(client.fps, 1)}, to=sid, callback=lambda *a: acked.set())
+            if not acked.wait(STREAM_ACK_TIMEOUT) and stop.is_set(): break
+            client.feedback(time.time() - t0)
+    finally:
+        frames.close()
+
+# --- 9. Serial Command Scheduler ---
+# Every write to the Arduino goes through this one thread. Servo angles are
+# last-write-wins per channel (a dragged slider only sends its newest angle),
+# while stop, pump-off and car commands jump ahead of everything queued.
+# Once the link has negotiated the framed protocol (protocol.py), pending servo
+# angles leave together as one pose frame and every frame is acked by sequence
+# number; unacked frames are resent a few times before counting as lost.
+SERIAL_MIN_GAP = 0.03          # ASCII: Arduino handles one command per 30 ms loop()
+SERIAL_MIN_GAP_FRAMED = 0.005  # framed: the sketch drains every buffered frame each loop()
+ACK_TIMEOUT = 0.15
+ACK_RETRIES = 2
+PRIO_URGENT, PRIO_NORMAL = 0, 1
+
+class SerialWriter:
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.heap = []            # [prio, seq, channel, (ch, ang) | raw bytes, queued_at]
+        self.servo_pending = {}   # channel -> heap entry still waiting
+        self.seq = 0
+        self.sent = 0
+        self.coalesced = 0
+        self.bytes = 0
+        self.latency_avg = 0.0
+        self.latency_max = 0.0
+        self.framed = False
+        self.frame_seq = 0
+        self.unacked = OrderedDict()   # frame seq -> [frame, sent_at, first_sent_at, tries (-1: no retry), kind]
+        self.acked = 0
+        self.retries = 0
+        self.lost = 0
+        self.ack_avg = 0.0
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def send(self, ch, ang):
+        ch, ang = int(ch), int(ang)
+        if ch == 8 and ang == 0: return self._push(PRIO_URGENT, None, (ch, ang))   # pump off
+        if ch >= 8: return self._push(PRIO_NORMAL, None, (ch, ang))
+        with self.cond:
+            entry = self.servo_pending.get(ch)
+            if entry is not None:
+                entry[3] = (ch, ang); entry[4] = time.time()
+                self.coalesced += 1
+                return
+            entry = self._push(PRIO_NORMAL, ch, (ch, ang))
+            self.servo_pending[ch] = entry
+
+    def send_pose(self, pose):
+        # {channel: angle}; one frame on the framed link, one line each on ASCII
+        for ch, ang in pose.items(): self.send(ch, ang)
+
+    def send_raw(self, payload, urgent=False):
+        self._push(PRIO_URGENT if urgent else PRIO_NORMAL, None, payload)
+
+    def _push(self, prio, ch, item):
+        with self.cond:
+            entry = [prio, self.seq, ch, item, time.time()]
+            self.seq += 1
+            heapq.heappush(self.heap, entry)
+            self.cond.notify()
+            return entry
+
+    def clear(self):
+        # Drop servo moves that have not reached the wire yet (STOP / RST)
+        with self.cond:
+            self.heap = [e for e in self.heap if e[2] is None]
+            heapq.heapify(self.heap)
+            self.servo_pending.clear()
+            self._supersede(T_POSE)
+
+    def set_framed(self, framed):
+        with self.cond:
+            self.framed = framed
+            self.unacked.clear()
+
+    def on_ack(self, seq, status):
+        # Called by the serial reader for ACK (and DISTANCE) frames
+        with self.cond:
+            item = self.unacked.get(seq)
+            if item is None: return
+            if status == ACK_BAD_CRC:
+                item[1] = 0.0   # resend on the writer's next pass
+                self.cond.notify()
+                return
+            del self.unacked[seq]
+            self.acked += 1
+            self.ack_avg += 0.1 * (time.time() - item[2] - self.ack_avg)
+        metrics.histogram('agribot_serial_ack_seconds').observe(time.time() - item[2])
+
+    def stats(self):
+        with self.cond:
+            return {"depth": len(self.heap), "sent": self.sent, "coalesced": self.coalesced, "bytes": self.bytes,
+                    "latency_ms_avg": round(self.latency_avg * 1000, 2), "latency_ms_max": round(self.latency_max * 1000, 2),
+                    "protocol": "framed" if self.framed else "ascii", "baud": getattr(arduino, 'baudrate', None),
+                    "acked": self.acked, "retries": self.retries, "lost": self.lost, "unacked": len(self.unacked),
+                    "ack_ms_avg": round(self.ack_avg * 1000, 2)}
+
+    def _encode(self, entry):
+        # -> bytes for the wire (called with the lock held)
+        item = entry[3]
+        if isinstance(item, bytes):
+            if not self.framed: return item
+            self._supersede(T_CAR)   # a resent 'w' must never land after a newer 'x'
+            return self._frame(T_CAR, item)
+        ch, ang = item
+        if not self.framed: return f"{ch},{ang}\n".encode()
+        if entry[2] is not None:
+            # gather every pending servo angle into one pose frame
+            pose = {ch: ang}
+            for other in list(self.servo_pending.values()):
+                if other is entry: continue
+                pose[other[3][0]] = other[3][1]
+                self.heap.remove(other)
+            heapq.heapify(self.heap)
+            self.servo_pending.clear()
+            self._supersede(T_POSE)
+            return self._frame(T_POSE, pose_payload(pose))
+        if ch == 8: return self._frame(T_PUMP, bytes([1 if ang else 0]))
+        if ch == 98: return self._frame(T_REQUEST, bytes([REQ_DISTANCE]))
+        if ch == 99: return self._frame(T_REQUEST, bytes([REQ_SOIL]))
+        return self._frame(T_SERVO, bytes([ch & 0xFF, max(0, min(180, ang))]))
+
+    def _supersede(self, kind):
+        # An older pose / car command is never worth resending: still count its ACK, but don't retry it
+        for item in self.unacked.values():
+            if item[4] == kind: item[3] = -1
+
+    def _frame(self, kind, payload):
+        self.frame_seq = self.frame_seq % 255 + 1   # 0 is reserved for HELLO
+        frame = encode(kind, self.frame_seq, payload)
+        now = time.time()
+        self.unacked[self.frame_seq] = [frame, now, now, 0, kind]
+        return frame
+
+    def _expired(self):
+        # Frames to resend (called with the lock held)
+        now, resend = time.time(), []
+        for seq, item in list(self.unacked.items()):
+            if now - item[1] < ACK_TIMEOUT: continue
+            if item[3] < 0: del self.unacked[seq]; continue
+            if item[3] >= ACK_RETRIES:
+                del self.unacked[seq]
+                self.lost += 1
+                metrics.inc('agribot_serial_lost_total')
+                continue
+            item[1] = now; item[3] += 1
+            self.retries += 1
+            resend.append(item[0])
+        return resend
+
+    def _write(self, data):
+        try:
+            if arduino and arduino.is_open:
+                arduino.write(data)
+                arduino.flush()
+        except Exception as e:
+            metrics.inc('agribot_exceptions_total', source='serial')
+            print(f"⚠️ Serial Error: {e}")
+
+    def _run(self):
+        last_servo = 0.0
+        while True:
+            with self.cond:
+                self.cond.wait_for(lambda: self.heap, ACK_TIMEOUT / 2 if self.unacked else None)
+                resend = self._expired() if self.unacked else []
+                entry = None
+                if self.heap and not resend:
+                    entry = self.heap[0]
+                    if entry[0] != PRIO_URGENT and entry[2] is not None:
+                        gap = last_servo + (SERIAL_MIN_GAP_FRAMED if self.framed else SERIAL_MIN_GAP) - time.time()
+                        if gap > 0:
+                            self.cond.wait(gap)   # an urgent command may arrive meanwhile
+                            continue
+                    heapq.heappop(self.heap)
+                    if entry[2] is not None: self.servo_pending.pop(entry[2], None)
+                    data = self._encode(entry)
+            for frame in resend:
+                self._write(frame)
+                metrics.inc('agribot_serial_bytes_total', len(frame))
+            if entry is None: continue
+            self._write(data)
+            now = time.time()
+            if entry[2] is not None: last_servo = now
+            latency = now - entry[4]
+            metrics.histogram('agribot_serial_latency_seconds').observe(latency)
+            metrics.inc('agribot_serial_bytes_total', len(data))
+            with self.cond:
+                self.sent += 1
+                self.bytes += len(data)
+                self.latency_avg += 0.1 * (latency - self.latency_avg)
+                self.latency_max = max(self.latency_max, latency)
+
+serial_writer = SerialWriter()
+
+# --- 9.1 Serial Reader & Sensor State ---
+# One thread owns the Arduino's output and parses every line into a
+# timestamped state, so nothing (soil readings, status lines) gets thrown
+# away. Callers wait on the condition for a fresh reply instead of sleeping.
+SENSOR_TIMEOUT = 0.5   # distance reply deadline (pulseIn alone can take 30 ms)
+
+class SensorState:
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.values = {}   # key -> (value, timestamp, seq)
+
+    def update(self, key, value):
+        with self.cond:
+            seq = self.values.get(key, (None, 0, 0))[2] + 1
+            self.values[key] = (value, time.time(), seq)
+            self.cond.notify_all()
+
+    def seq(self, key):
+        with self.cond: return self.values.get(key, (None, 0, 0))[2]
+
+    def wait_newer(self, key, seq, timeout):
+        with self.cond:
+            if not self.cond.wait_for(lambda: self.values.get(key, (None, 0, 0))[2] > seq, timeout): return None
+            return self.values[key][0]
+
+    def snapshot(self):
+        with self.cond: return {k: {"value": v, "ts": t} for k, (v, t, _) in self.values.items()}
+
+sensors = SensorState()
+
+def serial_reader():
+    parser = FrameParser()
+    while arduino and arduino.is_open:
         try:
-            array = picam2.capture_array()
-            frame = cv2.cvtColor(array, cv2.COLOR_RGBA2RGB)
-            frame = cv2.resize(frame, (320, 240))
-            frame = process_frame_tracking(frame)
-            ret, buffer = cv2.imencode('.jpg', frame)
-            yield (b'--frame\r\n' b'Content-Type: image/jpeg\r\n\r\n' + buffer.tobytes() + b'\r\n')
-        except: pass
-
-# --- 9. Helper Function ---
+            events = parser.feed(arduino.read(arduino.in_waiting or 1))
+        except Exception as e:
+            metrics.inc('agribot_exceptions_total', source='serial_read')
+            print(f"⚠️ Serial Read Error: {e}")
+            time.sleep(1); continue
+        for event in events:
+            if event[0] == 'frame': handle_frame(*event[1:])
+            else: handle_line(event[1])
+
+def handle_frame(kind, seq, payload):
+    if kind == T_ACK: serial_writer.on_ack(seq, payload[0])
+    elif kind == T_DISTANCE:
+        serial_writer.on_ack(seq, ACK_OK)
+        sensors.update('distance', int.from_bytes(payload[:2], 'little'))
+
+def handle_line(line):
+    if line.startswith("D:") or line.startswith("S:"):
+        try: value = int(line[2:])
+        except ValueError: return
+        key = 'distance' if line[0] == 'D' else 'soil'
+        sensors.update(key, value)
+        if key == 'soil': ui_state.set(soil=value)
+    else:
+        sensors.update('status', line)
+        ui_state.set(status=line.replace("Status: ", ""))
+        if "Pump ON" in line or "Pump OFF" in line: ui_state.set(pump="Pump ON" in line)
+
+# --- 9.2 Helper Function ---
 def send_arduino(ch, ang):
-    if arduino and arduino.is_open: arduino.write(f"{ch},{ang}\n".encode())
+    serial_writer.send(ch, ang)
+    if ch in ARM_NAMES: ui_state.set(**{ARM_NAMES[ch]: int(ang)})
+    elif ch == 8: ui_state.set(pump=bool(int(ang)))
+def send_pose(pose):
+    serial_writer.send_pose(pose)
+    ui_state.set(**{ARM_NAMES[ch]: int(ang) for ch, ang in pose.items() if ch in ARM_NAMES})
 def get_id(name): 
     if name == 'Pump': return 8
     return {'Base':0, 'Shoulder':1, 'Elbow':2, 'Gripper':3}.get(name, 0)
-def get_name(ch): return {0:'Base', 1:'Shoulder', 2:'Elbow', 3:'Gripper'}.get(ch, 'Unknown')
+ARM_NAMES = {0:'Base', 1:'Shoulder', 2:'Elbow', 3:'Gripper'}
+def get_name(ch): return ARM_NAMES.get(ch, 'Unknown')
 def get_distance():
     if arduino and arduino.is_open:
-        arduino.reset_input_buffer()
-        arduino.write(b"98,0\n") 
-        time.sleep(0.1)
-        if arduino.in_waiting:
-            try:
-                line = arduino.readline().decode().strip()
-                if "D:" in line: return int(line.split(":")[1])
-            except: pass
+        seq = sensors.seq('distance')
+        send_arduino(98, 0)
+        dist = sensors.wait_newer('distance', seq, SENSOR_TIMEOUT)
+        if dist is not None: return dist
     return 100
 
+# --- 9.3 Inference Worker ---
+# A single thread serves scan jobs from a bounded queue on whichever model the
+# registry (models.py) has live; a hot-swap takes effect from the next batch. Jobs that arrive together are coalesced onto one frame and
+# one invoke(); results are pushed over Socket.IO ('scan_result') and can also
+# be polled via /predict/result/<id>.
+MODEL_ERROR = {"name": "Error", "cause": "Model Error", "sol": "Check System", "link": "#", "accuracy": 0}
+SCAN_BUSY = {"name": "Busy", "cause": "Too many scans", "sol": "Try again", "link": "#", "accuracy": 0}
+
+TILE_OVERLAP = 0.25         # full-frame scans: overlap between neighbouring tiles
+TILE_SPRAY_FRACTION = 0.25  # spray when one disease tops this share of tiles
+
+class ScanJob:
+    def __init__(self, job_id, mode='single'):
+        self.id = job_id
+        self.mode = mode   # 'single' | 'tiles'
+        self.done = threading.Event()
+        self.result = None
+
+models = ModelRegistry(CLASSES, DISEASE_INFO, histogram=lambda name: metrics.histogram('agribot_model_invoke_seconds', model=name))
+
+class InferenceWorker:
+    def __init__(self, queue_size=INFER_QUEUE_SIZE, window=COALESCE_WINDOW):
+        self.window = window
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.lock = threading.Lock()
+        self.jobs = OrderedDict()   # recent jobs for polling
+        self.next_id = 1
+        self.heatmaps = OrderedDict()
+        threading.Thread(target=self._run, daemon=True).start()
+    def submit(self, mode='single'):
+        with self.lock:
+            job = ScanJob(self.next_id, mode)
+            self.next_id += 1
+            try: self.queue.put_nowait(job)
+            except queue.Full: return None
+            self.jobs[job.id] = job
+            while len(self.jobs) > 64: self.jobs.popitem(last=False)
+        return job
+
+    def get(self, job_id):
+        with self.lock: return self.jobs.get(job_id)
+
+    def heatmap(self, heatmap_id):
+        with self.lock: return self.heatmaps.get(heatmap_id)
+
+    def _load(self):
+        # The configured model goes live only once its warm-up invokes are done
+        interpreter = hardware.wait('model')
+        if interpreter is None: return
+        try:
+            models.activate(models.add(interpreter, config['model']).name)
+        except Exception as e:
+            print(f"⚠️ Model Error: {e}")
+
+    def _run(self):
+        self._load()
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.time() + self.window
+            while True:
+                remaining = deadline - time.time()
+                if remaining <= 0: break
+                try: batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty: break
+            model = models.active
+            for mode in dict.fromkeys(job.mode for job in batch):
+                try:
+                    if model is None: result = MODEL_ERROR
+                    else:
+                        with model.lock: result = self._scan_tiles(model) if mode == 'tiles' else self._scan(model)
+                except Exception as e:
+                    metrics.inc('agribot_exceptions_total', source='scan')
+                    print(f"⚠️ Scan Error: {e}")
+                    result = {**MODEL_ERROR, "cause": str(e)}
+                for job in batch:
+                    if job.mode != mode: continue
+                    job.result = result
+                    job.done.set()
+                    socketio.emit('scan_result', {"job": job.id, **result})
+
+    def classify(self, array):
+        # (model, probabilities, model-input RGB) for one frame, no spray and no history; None before a model is live
+        model = models.active
+        if model is None: return None
+        with metrics.stage('invoke'):
+            probs, rgb = model.classify(array)
+        models.offer_shadow(array, model, probs)
+        return model, probs, rgb
+
+    def _scan(self, model):
+        model.use_batch(1)
+        with metrics.stage('scan_capture'):
+            array = capture_array()
+        with metrics.stage('preprocess'):
+            input_data = model.preprocess(array)
+        with metrics.stage('invoke'):
+            output_data = model.invoke(input_data)
+        idx = int(np.argmax(output_data))
+        accuracy = round(float(np.max(output_data)) * 100, 2)
+        metrics.inc('agribot_inference_total', **{'class': model.classes[idx]})
+        info = model.info(idx)
+        action = "None"
+        if idx != model.healthy:
+            action = "Spray"
+            serial_writer.send_raw(b'p')
+        scan_history.record(model.preprocess.rgb.copy(), idx, model.classes[idx], output_data)
+        models.offer_shadow(array, model, output_data[0])
+        return {"name": info["name"], "cause": info["cause"], "sol": info["sol"], "link": info["link"], "action": action, "accuracy": accuracy,
+                "model": model.name}
+
+    def _scan_tiles(self, model):
+        # Overlapping model-sized tiles of the full-resolution frame, run as one batch
+        with metrics.stage('scan_capture'):
+            array = capture_array()
+        tile, classes, healthy = model.input_size, model.classes, model.healthy
+        origins = tile_origins((array.shape[1], array.shape[0]), tile, TILE_OVERLAP)
+        probs = np.empty((len(origins), len(classes)), np.float32)
+        with metrics.stage('tile_invoke'):
+            if model.use_batch(len(origins)):
+                for i, (x, y) in enumerate(origins): model.preprocess(array[y:y + tile, x:x + tile], slot=i)
+                probs[:] = model.invoke(model.preprocess.tensor)
+            else:
+                for i, (x, y) in enumerate(origins):
+                    probs[i] = model.invoke(model.preprocess(array[y:y + tile, x:x + tile]))[0]
+        top = probs.argmax(axis=1)
+        counts = np.bincount(top, minlength=len(classes))
+        disease_counts = counts.copy(); disease_counts[healthy] = -1
+        worst = int(np.argmax(disease_counts)) if counts.sum() > counts[healthy] else healthy
+        for c in top: metrics.inc('agribot_inference_total', **{'class': classes[c]})
+        overlay = severity_heatmap(cv2.cvtColor(array, cv2.COLOR_BGRA2BGR), origins, tile, 1.0 - probs[:, healthy])
+        ok, jpeg = cv2.imencode('.jpg', overlay, [cv2.IMWRITE_JPEG_QUALITY, 80])
+        with self.lock:
+            heatmap_id = self.next_id   # unique enough: ids only ever grow
+            self.heatmaps[heatmap_id] = jpeg.tobytes()
+            while len(self.heatmaps) > 8: self.heatmaps.popitem(last=False)
+        action = "None"
+        if worst != healthy and counts[worst] >= TILE_SPRAY_FRACTION * len(origins):
+            action = "Spray"
+            serial_writer.send_raw(b'p')
+        mean_probs = probs.mean(axis=0)
+        scan_history.record(cv2.cvtColor(overlay, cv2.COLOR_BGR2RGB), worst, classes[worst], mean_probs)
+        info = model.info(worst)
+        summary = [{"class": classes[c], "name": model.info(c)["name"], "tiles": int(counts[c]),
+                    "max": round(float(probs[:, c].max()) * 100, 2), "mean": round(float(mean_probs[c]) * 100, 2)}
+                   for c in np.argsort(-counts) if counts[c] > 0]
+        return {"name": info["name"], "cause": info["cause"], "sol": info["sol"], "link": info["link"], "action": action,
+                "accuracy": round(float(probs[top == worst, worst].max()) * 100, 2), "mode": "tiles", "tiles": len(origins),
+                "diseased_tiles": int(len(origins) - counts[healthy]), "severity": round(float((1.0 - probs[:, healthy]).mean()) * 100, 1),
+                "classes": summary, "heatmap": f"/predict/heatmap/{heatmap_id}",
+                "model": model.name}
+
+inference = InferenceWorker()
+scan_history = HistoryStore("Scan_History", retention_days=HISTORY_RETENTION_DAYS, max_scans=HISTORY_MAX_SCANS)
+
+# --- 9.4 Continuous Monitoring ---
+MONITOR_HZ = 4               # frames sampled per second while monitoring
+MONITOR_WINDOW = 5           # probability vectors averaged before deciding
+MONITOR_THRESHOLD = 0.6      # smoothed confidence needed to act
+MONITOR_SPRAY_COOLDOWN = 10  # seconds between sprays
+monitor_jobs = JobRunner()   # separate from `jobs`: monitoring runs alongside harvest/playback
+monitor_status = {"state": "off", "inferred": 0, "skipped": 0, "sprays": 0}
+
+def monitor_loop(job):
+    gate = SceneGate()
+    model = smoother = None
+    last_spray, last_idx, last = 0.0, None, None
+    monitor_status.update({"state": "on", "inferred": 0, "skipped": 0, "sprays": 0, "class": None, "name": None, "confidence": 0})
+    socketio.emit('monitor', monitor_status)
+    while job.sleep(1.0 / MONITOR_HZ):
+        try:
+            with metrics.stage('monitor_capture'):
+                array = capture_array()
+            changed = gate.changed(array, time.time())   # every frame, so the first one sets the reference
+            settled = smoother is not None and smoother.count >= smoother.min_frames
+            if not changed and settled and last[0] is models.active:
+                # unchanged scene: a repeat of the last result is no new evidence, so the window is left alone
+                monitor_status['skipped'] += 1
+                metrics.inc('agribot_monitor_frames_total', result='skipped')
+                continue
+            # until the window holds min_frames real inferences, a still scene is classified anyway
+            last = inference.classify(array)
+            if last is None: continue
+            if last[0] is not model:
+                # hot-swapped model: its classes may differ, so start the window over
+                model, last_idx = last[0], None
+                smoother = ProbabilitySmoother(len(model.classes), window=MONITOR_WINDOW, threshold=MONITOR_THRESHOLD)
+            _, probs, rgb = last
+            monitor_status['inferred'] += 1
+            metrics.inc('agribot_monitor_frames_total', result='inferred')
+            smoother.update(probs)
+            idx, conf = smoother.decision()
+            if idx is None:
+                monitor_status.update({"class": None, "confidence": round(conf * 100, 1)})
+                continue
+            monitor_status.update({"class": model.classes[idx], "name": model.info(idx)["name"], "confidence": round(conf * 100, 1)})
+            if idx != last_idx: socketio.emit('monitor', monitor_status)
+            last_idx = idx
+            if idx != model.healthy and job.active and time.time() - last_spray > MONITOR_SPRAY_COOLDOWN:
+                last_spray = time.time()
+                monitor_status['sprays'] += 1
+                serial_writer.send_raw(b'p')
+                scan_history.record(rgb, idx, model.classes[idx], smoother.mean())
+                socketio.emit('monitor', monitor_status)
+        except Exception as e:
+            metrics.inc('agribot_exceptions_total', source='monitor')
+            print(f"⚠️ Monitor Error: {e}")
+    monitor_status['state'] = "off"
+    socketio.emit('monitor', monitor_status)
+
 # --- ১০. Hurvest Logic ---
-def harvest_thread_func(color):
-    global is_tracking, target_color, current_base, current_shoulder, current_elbow
+APPROACH_SETTLE = 0.05   # let a 2° step land before the next distance reading
+TRACK_SETTLE_TIMEOUT = 2 # give up waiting for a centered target after this long
+BASE_SETTLE = 0.4        # let a planned base move land before fine tracking
+HARVEST_DROP_ANGLE = 160
+HARVEST_MAX_TARGETS = 6
+harvest_stats = {}       # last run: planned, picked, seconds, corrections
+
+def plan_harvest(color):
+    # One detection pass -> [(base angle, expected box once centred), ...] in visit order
+    frame = cv2.cvtColor(capture_array(), cv2.COLOR_BGRA2BGR)
+    width = frame.shape[1]
+    targets = find_targets(frame, color, tracker.min_area, TRACK_MIN_WIDTH * width / 640, HARVEST_MAX_TARGETS)
+    angles = [max(0, min(180, int(round(pixel_to_angle(t[5], width, current_base, CAMERA_HFOV))))) for t in targets]
+    order = plan_order(current_base, angles, HARVEST_DROP_ANGLE)
+    return [(angles[i], (int(width / 2 - targets[i][2] / 2), targets[i][1], targets[i][2], targets[i][3], targets[i][4])) for i in order]
+
+def harvest_thread_func(job, color):
+    global target_color, current_base
     target_color = color
-    is_tracking = True
-    socketio.emit('status_msg', f"Tracking {color}...")
+    try:
+        plan = plan_harvest(color)
+    except Exception as e:
+        # camera failed or still starting: say so instead of dying with the gripper already open
+        metrics.inc('agribot_exceptions_total', source='harvest')
+        print(f"⚠️ Harvest Error: {e}")
+        ui_state.set(status=f"Harvest failed: {e}")
+        return
+    if not plan:
+        ui_state.set(status=f"No {color} fruit in view.")
+        return
     send_arduino(3, 90)
-    if not smart_sleep(2): return 
+    ui_state.set(status=f"{len(plan)} {color} fruit: " + ", ".join(f"{a}°" for a, _ in plan))
+    t0 = time.time()
+    harvest_stats.update(planned=len(plan), picked=0, seconds=0, corrections=0)
+    for n, (angle, box) in enumerate(plan, 1):
+        if not job.active: break
+        ui_state.set(status=f"Fruit {n}/{len(plan)} at {angle}°...")
+        current_base = angle
+        send_arduino(0, angle)
+        if not job.sleep(BASE_SETTLE): break
+        tracking.start(job, color, box)
+        try:
+            if harvest_sequence(job): harvest_stats['picked'] += 1
+        finally:
+            tracking.stop()
+            harvest_stats['corrections'] += tracking.commands
+    if not job.active: return
+    send_arduino(0, 90)
+    current_base = 90
+    harvest_stats['seconds'] = round(time.time() - t0, 1)
+    ui_state.set(status=f"Done: {harvest_stats['picked']}/{len(plan)} in {harvest_stats['seconds']}s ({harvest_stats['corrections']} base corrections)")
+
+def harvest_sequence(job):
+    # Pick the fruit in front of the arm and drop it; True once dropped
+    global current_base, current_shoulder, current_elbow
+    tracking.wait_centered(job, TRACK_SETTLE_TIMEOUT)
+    if not job.active: return False
     dist = get_distance()
-    socketio.emit('status_msg', f"Distance: {dist}cm")
+    ui_state.set(status=f"Distance: {dist}cm")
     if dist > 30 or dist == 0:
-        socketio.emit('status_msg', "Too far! Stopping.")
-        is_tracking = False; return
-    socketio.emit('status_msg', "Approaching...")
+        ui_state.set(status="Too far! Skipping.")
+        return False
+    ui_state.set(status="Approaching...")
     for i in range(20):
-        if not is_tracking: return 
+        if not job.active: return False
         dist = get_distance()
         if dist <= 7 and dist > 0: break
         current_shoulder += 2; current_elbow -= 2
         send_arduino(1, current_shoulder); send_arduino(2, current_elbow)
-        if not smart_sleep(0.5): return 
-    socketio.emit('status_msg', "Grabbing (Safety 140)...")
-    if not smart_sleep(0.5): return
+        if not job.sleep(APPROACH_SETTLE): return False
+    tracking.stop()   # the base is ours again for the drop
+    ui_state.set(status="Grabbing (Safety 140)...")
+    if not job.sleep(0.5): return False
     send_arduino(3, 140)
-    if not smart_sleep(1): return
-    socketio.emit('status_msg', "Pulling Back...")
+    if not job.sleep(1): return False
+    ui_state.set(status="Pulling Back...")
     current_shoulder = 90; current_elbow = 90
     send_arduino(1, 90); send_arduino(2, 90)
-    if not smart_sleep(1.5): return
-    socketio.emit('status_msg', "Dropping at 160°...")
-    send_arduino(0, 160)
-    if not smart_sleep(2): return
+    if not job.sleep(1.5): return False
+    ui_state.set(status=f"Dropping at {HARVEST_DROP_ANGLE}°...")
+    send_arduino(0, HARVEST_DROP_ANGLE)
+    current_base = HARVEST_DROP_ANGLE
+    if not job.sleep(2): return False
     send_arduino(3, 90)
-    if not smart_sleep(1): return
-    send_arduino(0, 90)
-    current_base = 90; is_tracking = False
-    socketio.emit('status_msg', "Done.")
-
-def playback_loop(mode):
-    global is_playing
-    if not recorded_steps: return
-    send_arduino(recorded_steps[0]['ch'], recorded_steps[0]['ang'])
-    socketio.emit('update_ui', {'id': get_name(recorded_steps[0]['ch']), 'val': recorded_steps[0]['ang']})
-    time.sleep(1)
-    while is_playing:
-        for step in recorded_steps:
-            if not is_playing: break
-            if not smart_sleep(step['delay']): return 
-            send_arduino(step['ch'], step['ang'])
-            socketio.emit('update_ui', {'id': get_name(step['ch']), 'val': step['ang']})
-        if not is_playing: break
-        send_arduino(0, 90); send_arduino(1, 90); send_arduino(2, 90); send_arduino(3, 140)
-        socketio.emit('update_ui', {'id': 'Gripper', 'val': 140})
-        if not smart_sleep(2): return
+    if not job.sleep(1): return False
+    return True
+
+def playback_loop(job, mode, rec):
+    ticks, channels, angles = resample(rec, PLAYBACK_HZ)
+    if not len(ticks): return
+    while job.active:
+        last = {}
+        start = None
+        for i, t in enumerate(ticks):
+            if start is not None and not job.sleep(max(0.0, start + t - time.time())): return
+            for ch, ang in zip(channels, angles[:, i]):
+                if ang < 0 or last.get(ch) == ang: continue
+                last[ch] = int(ang)
+                send_arduino(ch, int(ang))
+            if start is None:
+                # settle on the start pose before the timeline begins
+                if not job.sleep(1): return
+                start = time.time()
+        if not job.active: break
+        send_pose({0: 90, 1: 90, 2: 90, 3: 140})
+        if not job.sleep(2): return
         if mode == 'once': break 
-    is_playing = False
-    socketio.emit('status_msg', "Stopped.")
+    ui_state.set(status="Stopped.")
+
+# --- 10.1 Live Stats ---
+metrics.describe('agribot_stage_seconds', "Time spent per pipeline stage")
+metrics.describe('agribot_serial_latency_seconds', "send_arduino() to on-the-wire latency")
+metrics.describe('agribot_ui_messages_total', "Batched 'state' messages broadcast to the UI")
+metrics.describe('agribot_serial_ack_seconds', "Framed command round trip until the Arduino's ACK")
+metrics.describe('agribot_monitor_frames_total', "Monitoring frames by outcome (inferred or skipped as unchanged)")
+metrics.describe('agribot_model_invoke_seconds', "Interpreter invoke() time per model, shadow runs included")
+metrics.gauge('agribot_serial_queue_depth', lambda: len(serial_writer.heap))
+metrics.gauge('agribot_inference_queue_depth', lambda: inference.queue.qsize())
+metrics.gauge('agribot_history_dropped', lambda: scan_history.dropped)
+metrics.gauge('agribot_video_clients', lambda: frame_hub.subscribers)
+stats_clients = 0
+
+def stats_loop():
+    last_frames, last_t = 0, time.time()
+    while True:
+        time.sleep(STATS_INTERVAL)
+        frames, now = metrics.counter_value('agribot_frames_total'), time.time()
+        fps = (frames - last_frames) / (now - last_t)
+        last_frames, last_t = frames, now
+        if stats_clients <= 0: continue
+        socketio.emit('stats', {"fps": round(fps, 1), "dropped": metrics.counter_value('agribot_frames_dropped_total'),
+                                "serial_depth": len(serial_writer.heap), "stages": metrics.summary()})
+        if monitor_status['state'] == "on": socketio.emit('monitor', monitor_status)
+
+threading.Thread(target=stats_loop, daemon=True).start()
 
 # --- 11. Routes ---
 @app.route('/')
 def index(): return render_template_string(HTML_CODE)
 @app.route('/video_feed')
-def video_feed(): return Response(gen_frames(), mimetype='multipart/x-mixed-replace; boundary=frame')
+def video_feed():
+    # /video_feed?fps=10&q=55&adaptive=1
+    client = StreamClient(request.args.get('fps', type=float), request.args.get('q', type=int), request.args.get('adaptive') == '1')
+    return Response(gen_frames(client), mimetype='multipart/x-mixed-replace; boundary=frame')
+CAR_MOTION = {'w': "forward", '8': "forward", 's': "back", '2': "back", 'a': "left", '4': "left",
+              'd': "right", '6': "right", 'x': "stop", '5': "stop"}
 @app.route('/command')
 def command():
     cmd = request.args.get('cmd')
-    if arduino and arduino.is_open:
-        try: arduino.write(cmd.encode())
-        except: pass
+    if cmd:
+        serial_writer.send_raw(cmd.encode(), urgent=True)
+        if cmd in CAR_MOTION: ui_state.set(car=CAR_MOTION[cmd])
+        if cmd in ('U', 'M', 'x', '5'): ui_state.set(mode="auto" if cmd == 'U' else "manual")
+        if cmd == 'M': ui_state.set(car="stop")
     return "OK"
+@app.route('/metrics')
+def metrics_page(): return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+@app.route('/ready')
+def ready(): return jsonify(hardware.ready())
+@app.route('/serial_stats')
+def serial_stats(): return jsonify(serial_writer.stats())
+@app.route('/recordings')
+def recordings(): return jsonify(motion_library.list())
+@app.route('/sensors')
+def sensor_state(): return jsonify(sensors.snapshot())
 @app.route('/predict')
 def predict():
-    if not interpreter:
-        return jsonify({"name": "Error", "cause": "Model Error", "sol": "Check System", "link": "#", "accuracy": 0})
-    stream = io.BytesIO()
-    picam2.capture_file(stream, format='jpeg')
-    img = Image.open(stream).convert('RGB').resize((224, 224))
-    input_data = np.expand_dims(np.array(img, dtype=np.float32) / 255.0, axis=0)
-    interpreter.set_tensor(input_details[0]['index'], input_data)
-    interpreter.invoke()
-    output_data = interpreter.get_tensor(output_details[0]['index'])
-    idx = int(np.argmax(output_data))
-    accuracy = round(float(np.max(output_data)) * 100, 2)
-    classes = ["Tomato___Bacterial_spot", "Tomato___Early_blight", "Tomato___Late_blight", "Tomato___Leaf_Mold", "Tomato___Septoria_leaf_spot", "Tomato___Spider_mites Two-spotted_spider_mite", "Tomato___Target_Spot", "Tomato___Tomato_Yellow_Leaf_Curl_Virus", "Tomato___Tomato_mosaic_virus", "Tomato___healthy"]
-    info = DISEASE_INFO.get(idx, {"name": "অজানা রোগ", "cause": "শনাক্ত করা যায়নি", "sol": "পরামর্শ নিন", "link": "#"})
-    action = "None"
-    if classes[idx] != "Tomato___healthy":
-        action = "Spray"
-        if arduino and arduino.is_open: arduino.write(b'p')
-    if not os.path.exists("Scan_History"): os.makedirs("Scan_History")
-    filename = f"Scan_History/{classes[idx]}_{accuracy}%_{datetime.now().strftime('%d-%m-%Y_%H-%M-%S')}.jpg"
-    img.save(filename)
-    return jsonify({"name": info["name"], "cause": info["cause"], "sol": info["sol"], "link": info["link"], "action": action, "accuracy": accuracy})
+    # ?mode=tiles scans the full frame as overlapping tiles and returns a heatmap
+    job = inference.submit(request.args.get('mode', 'single'))
+    if job is None: return jsonify(SCAN_BUSY)
+    job.done.wait()
+    return jsonify(job.result)
+@app.route('/predict/submit')
+def predict_submit():
+    job = inference.submit(request.args.get('mode', 'single'))
+    if job is None: return jsonify({"job": None, **SCAN_BUSY}), 503
+    return jsonify({"job": job.id})
+@app.route('/monitor', methods=['GET', 'POST'])
+def monitor():
+    # POST ?action=start|stop toggles continuous monitoring; GET reports its counters
+    action = request.args.get('action')
+    if request.method == 'POST' and action == 'start': monitor_jobs.start('monitor', monitor_loop)
+    elif request.method == 'POST' and action == 'stop': monitor_jobs.stop()
+    return jsonify(monitor_status)
+@app.route('/models')
+def models_status(): return jsonify(models.status())
+@app.route('/models/load', methods=['POST'])
+def models_load():
+    # ?path=new.tflite[&backend=&name=&manifest=&activate=1]; loads and warms up in the background
+    cfg = dict(config['model'], name=None, manifest=None)
+    cfg.update({k: v for k, v in request.args.items() if k in ('path', 'backend', 'name', 'manifest') and v})
+    if cfg['backend'] not in FACTORIES['model']: return jsonify({"error": f"unknown backend {cfg['backend']}"}), 400
+    try: name = models.load(cfg, activate=request.args.get('activate') == '1')
+    except ModelExists as e: return jsonify({"error": str(e)}), 409
+    except (OSError, ValueError) as e: return jsonify({"error": str(e)}), 400
+    return jsonify({"loading": name}), 202
+@app.route('/models/<action>', methods=['POST'])
+def models_action(action):
+    # activate | shadow | unload ?name=; shadow without a name stops the A/B comparison
+    name = request.args.get('name')
+    if action not in ('activate', 'shadow', 'unload'): return "Not found", 404
+    if not name and action != 'shadow': return jsonify({"error": "name is required"}), 400
+    if name and name not in models.models: return jsonify({"error": f"unknown model {name}"}), 404
+    if action == 'activate': models.activate(name)
+    elif action == 'shadow': models.set_shadow(name)
+    elif action == 'unload' and not models.unload(name): return jsonify({"error": "cannot unload the active model"}), 409
+    return jsonify(models.status())
+@app.route('/predict/heatmap/<int:heatmap_id>')
+def predict_heatmap(heatmap_id):
+    jpeg = inference.heatmap(heatmap_id)
+    if jpeg is None: return "Not found", 404
+    return Response(jpeg, mimetype='image/jpeg')
+@app.route('/predict/result/<int:job_id>')
+def predict_result(job_id):
+    job = inference.get(job_id)
+    if job is None: return jsonify({"job": job_id, "state": "unknown"}), 404
+    if not job.done.is_set(): return jsonify({"job": job_id, "state": "pending"})
+    return jsonify({"job": job_id, "state": "done", **job.result})
+
+@app.route('/history')
+def history():
+    args = request.args
+    def num(key, cast=float):
+        try: return cast(args[key]) if key in args else None
+        except ValueError: return None
+    return jsonify(scan_history.query(class_name=args.get('class'), since=num('since'), until=num('until'),
+                                      min_conf=num('min_conf'), limit=min(num('limit', int) or 50, 500),
+                                      offset=num('offset', int) or 0))
+@app.route('/history/image/<int:scan_id>')
+def history_image(scan_id):
+    path = scan_history.image_path(scan_id)
+    if not path or not os.path.exists(path): return "Not found", 404
+    return send_file(os.path.abspath(path), mimetype='image/jpeg')
+@app.route('/history/prune', methods=['POST'])
+def history_prune():
+    days = request.args.get('days', type=float); keep = request.args.get('keep', type=int)
+    return jsonify({"removed": scan_history.prune(days, keep)})
 
 @app.route('/<page_name>')
 def show_disease_page(page_name):
@@ -490,54 +1374,130 @@ def show_disease_page(page_name):
         return f"<h1>Error: {page_name}.html not found in templates folder!</h1>"
 
 # Socket Events
+@socketio.on('connect')
+def on_connect():
+    global stats_clients
+    stats_clients += 1
+    socketio.emit('state', ui_state.snapshot(), to=request.sid)
+    socketio.emit('ready', hardware.ready(), to=request.sid)
+    socketio.emit('monitor', monitor_status, to=request.sid)
+@socketio.on('disconnect')
+def on_disconnect():
+    global stats_clients
+    stats_clients -= 1
+    on_stream_stop()
+@socketio.on('stream_start')
+def on_stream_start(opts=None):
+    opts = opts or {}
+    on_stream_stop()
+    stop = threading.Event()
+    ws_streams[request.sid] = stop
+    client = StreamClient(opts.get('fps'), opts.get('q'), opts.get('adaptive', True))
+    threading.Thread(target=ws_stream, args=(request.sid, client, stop), daemon=True).start()
+@socketio.on('stream_stop')
+def on_stream_stop():
+    stop = ws_streams.pop(request.sid, None)
+    if stop: stop.set()
 @socketio.on('move')
 def on_move(data):
-    global is_recording, start_record_time, current_base, current_shoulder, current_elbow
+    global current_base, current_shoulder, current_elbow
     ch = get_id(data['id']); ang = int(data['val'])
     if ch == 0: current_base = ang
     elif ch == 1: current_shoulder = ang
     elif ch == 2: current_elbow = ang
     send_arduino(ch, ang)
-    if is_recording and ch != 8:
-        t = time.time()
-        recorded_steps.append({'ch': ch, 'ang': ang, 'delay': t - start_record_time})
-        start_record_time = t
+    steps = recording_steps
+    if steps is not None and ch != 8:
+        steps.append((time.time() - start_record_time, ch, ang))
 @socketio.on('harvest_request')
 def on_harvest(color): 
-    global is_tracking
-    if not is_tracking: threading.Thread(target=harvest_thread_func, args=(color,)).start()
+    if not jobs.start('harvest', harvest_thread_func, color): ui_state.set(status="Busy, press STOP first.")
 @socketio.on('check_sensor')
 def on_check(): send_arduino(99, 0)
 @socketio.on('rec_ctrl')
 def on_rec(cmd):
-    global is_recording, start_record_time, recorded_steps
-    if cmd == 'start': is_recording = True; recorded_steps = []; start_record_time = time.time(); socketio.emit('status_msg', "Recording...")
-    else: is_recording = False; socketio.emit('status_msg', f"Saved {len(recorded_steps)} steps.")
+    # 'start' | 'stop' | {'cmd': 'stop', 'name': 'row_1'}
+    global recording_steps, start_record_time, current_recording
+    name = None
+    if isinstance(cmd, dict): name = cmd.get('name'); cmd = cmd.get('cmd')
+    if cmd == 'start':
+        start_record_time = time.time(); recording_steps = []
+        ui_state.set(status="Recording...")
+    elif recording_steps is not None:
+        steps, recording_steps = recording_steps, None
+        if not steps: ui_state.set(status="Nothing recorded."); return
+        rec = to_motion(steps)
+        if RECORD_SIMPLIFY > 0: rec = simplify(rec, RECORD_SIMPLIFY)
+        name = motion_library.save(name or datetime.now().strftime('rec_%d-%m-%Y_%H-%M-%S'), rec)
+        current_recording = motion_library.load(name)
+        ui_state.set(status=f"Saved {name}: {len(rec)} of {len(steps)} steps.")
+        socketio.emit('recordings', {'items': motion_library.list(), 'current': name})
+@socketio.on('list_recordings')
+def on_list_recordings(): socketio.emit('recordings', {'items': motion_library.list()}, to=request.sid)
 @socketio.on('play_ctrl')
 def on_play(cmd):
-    global is_playing, is_tracking
+    # 'once' | 'loop' | 'stop' | {'cmd': 'once', 'name': 'row_1'}
+    global current_recording
+    name = None
+    if isinstance(cmd, dict): name = cmd.get('name'); cmd = cmd.get('cmd')
     if cmd == 'stop': 
-        is_playing = False; is_tracking = False 
+        jobs.stop()
+        monitor_jobs.stop()   # monitoring drives the pump too
+        serial_writer.clear()
         send_arduino(8, 0) 
-        socketio.emit('status_msg', "Stopping Immediately (Pump OFF)...")
-    elif not is_playing: 
-        is_playing = True; threading.Thread(target=playback_loop, args=(cmd,)).start()
+        ui_state.set(status="Stopping Immediately (Pump OFF)...")
+    else:
+        if name:
+            rec = motion_library.load(name)
+            if rec is None: ui_state.set(status=f"No recording {name}"); return
+            current_recording = rec
+        if current_recording is None or not len(current_recording): return
+        if not jobs.start('playback', playback_loop, cmd, current_recording): ui_state.set(status="Busy, press STOP first.")
+@socketio.on('monitor_ctrl')
+def on_monitor(cmd):
+    # 'start' | 'stop'
+    if cmd == 'start':
+        if not monitor_jobs.start('monitor', monitor_loop): ui_state.set(status="Monitoring already running.")
+    elif cmd == 'stop': monitor_jobs.stop()
 @socketio.on('go_home')
 def on_go_home():
-    global is_playing, is_tracking, current_base, current_shoulder, current_elbow
-    is_playing = False; is_tracking = False 
+    global current_base, current_shoulder, current_elbow
+    jobs.stop()
+    monitor_jobs.stop()
+    serial_writer.clear()
     send_arduino(8, 0) 
     current_base = 90; current_shoulder = 90; current_elbow = 90
-    socketio.emit('status_msg', "Resetting Arm...")
-    send_arduino(3, 140); time.sleep(0.2)
-    send_arduino(1, 90); time.sleep(0.2)
-    send_arduino(2, 90); time.sleep(0.2)
-    send_arduino(0, 90)
-    socketio.emit('update_ui', {'id': 'Base', 'val': 90})
-    socketio.emit('update_ui', {'id': 'Shoulder', 'val': 90})
-    socketio.emit('update_ui', {'id': 'Elbow', 'val': 90})
-    socketio.emit('update_ui', {'id': 'Gripper', 'val': 140})
-    socketio.emit('status_msg', "Reset Done ✅")
+    ui_state.set(status="Resetting Arm...")
+    send_pose({3: 140, 1: 90, 2: 90, 0: 90})
+    ui_state.set(status="Reset Done ✅")
+
+# --- 12. Startup ---
+def on_backend(kind, status):
+    global arduino
+    if kind == 'serial' and status['state'] == 'ready':
+        conn = hardware.get('serial')
+        if config['serial']['protocol'] == 'framed':
+            try:
+                framed, baud = negotiate(conn, config['serial']['fast_baud'])
+                serial_writer.set_framed(framed)
+                print(f"✅ serial link: {'framed' if framed else 'ascii'} @ {baud}")
+            except Exception as e:
+                print(f"⚠️ Serial negotiation failed, using ASCII: {e}")
+        arduino = conn
+        threading.Thread(target=serial_reader, daemon=True).start()
+    if status['state'] == 'ready': print(f"✅ {kind} ready ({status['backend']}, {status['seconds']}s)")
+    else: print(f"⚠️ {kind} {status['state']} ({status['backend']}): {status.get('error', '')}")
+    socketio.emit('ready', hardware.ready())
+
+def on_model(event, name):
+    # 'active' after a hot-swap, 'loaded' when a standby model is ready, 'failed' on a bad load
+    if event == 'failed': print(f"⚠️ Model {name}: {models.status()['loading'].get(name)}")
+    else: print(f"✅ Model {name} {event}")
+    ui_state.set(status=f"Model {name}: {event}")
+
+hardware.listeners.append(on_backend)
+models.listeners.append(on_model)
+hardware.start_all()
 
 if __name__ == '__main__':
-    socketio.run(app, host='0.0.0.0', port=5000, debug=False)
\ No newline at end of file
+    socketio.run(app, host=config['server']['host'], port=config['server']['port'], debug=False)
\ No newline at end of file
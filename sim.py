@@ -0,0 +1,246 @@
+import os
+import glob
+import time
+import select
+import threading
+import tty
+from functools import lru_cache
+import numpy as np
+import cv2
+import protocol
+
+# Drop-in stand-ins for the robot's hardware, so the app can be exercised and
+# benchmarked on any Linux box:
+#   FakeCamera       - Picamera2 look-alike replaying frames from disk
+#   FakeArduino      - pty-backed device speaking the arduno_code.ino protocols
+#   StubInterpreter  - TFLite Interpreter look-alike with a configurable delay
+
+# --- 1. Camera ---
+@lru_cache(maxsize=4)
+def leafy_background(size=(640, 480)):
+    w, h = size
+    rng = np.random.default_rng(0)
+    frame = np.empty((h, w, 4), dtype=np.uint8)
+    frame[:, :, 0] = rng.integers(0, 80, (h, w), dtype=np.uint8)
+    frame[:, :, 1] = rng.integers(60, 200, (h, w), dtype=np.uint8)
+    frame[:, :, 2] = rng.integers(0, 80, (h, w), dtype=np.uint8)
+    frame[:, :, 3] = 255
+    return frame
+
+def synthetic_frame(cx, size=(640, 480)):
+    # Leafy background with a red fruit centred at x=cx, or one per x in a list (BGRA, like XRGB8888)
+    frame = leafy_background(size).copy()
+    for x in (cx if isinstance(cx, (list, tuple)) else [cx]):
+        cv2.circle(frame, (int(x), size[1] // 2), size[1] // 10, (20, 20, 200, 255), -1)
+    return frame
+
+def load_frames(source, size=(640, 480), limit=300):
+    frames = []
+    if os.path.isdir(source):
+        for path in sorted(glob.glob(os.path.join(source, '*'))):
+            img = cv2.imread(path)
+            if img is not None: frames.append(img)
+            if len(frames) >= limit: break
+    else:
+        cap = cv2.VideoCapture(source)
+        while len(frames) < limit:
+            ok, img = cap.read()
+            if not ok: break
+            frames.append(img)
+        cap.release()
+    return [cv2.cvtColor(cv2.resize(f, size), cv2.COLOR_BGR2BGRA) for f in frames]
+
+class FakeCamera:
+    def __init__(self, source=None, fps=30, scene=None):
+        # scene: optional callable returning the next frame (e.g. follows the arm)
+        self.fps = fps
+        self.scene = scene
+        self.frames = load_frames(source) if source else [synthetic_frame(160 + 8 * i) for i in range(40)]
+        self.index = 0
+        self.lock = threading.Lock()
+        self.next_frame = time.time()
+
+    def create_preview_configuration(self, main=None, **kwargs): return {"main": main}
+    def configure(self, config): pass
+    def start(self): pass
+    def stop(self): pass
+
+    def capture_array(self, name="main"):
+        with self.lock:
+            # Real sensors deliver frames on a fixed clock; callers share it
+            now = time.time()
+            if now < self.next_frame: time.sleep(self.next_frame - now)
+            self.next_frame = max(self.next_frame + 1.0 / self.fps, time.time())
+            if self.scene: return self.scene()
+            frame = self.frames[self.index % len(self.frames)]
+            self.index += 1
+            return frame.copy()
+
+    def capture_file(self, stream, format='jpeg'):
+        ok, buf = cv2.imencode('.jpg', cv2.cvtColor(self.capture_array(), cv2.COLOR_BGRA2BGR))
+        stream.write(buf.tobytes())
+
+# --- 2. Arduino ---
+class FakeArduino:
+    LOOP_DELAY = 0.03   # delay(30) at the end of loop()
+
+    def __init__(self, baud=9600, distance=None, soil=520, framed=True):
+        # distance: callable (servo angles dict) -> cm for the arm's HC-SR04
+        # framed=False behaves like firmware from before the binary protocol
+        self.baud = baud
+        self.framed = framed
+        self.linked = False  # HELLO seen: stray non-frame bytes are dropped
+        self.distance = distance or (lambda pos: 20)
+        self.soil = soil
+        self.pos = {0: 90, 1: 90, 2: 90, 3: 130, 4: 90}
+        self.pump = False
+        self.received = []   # (timestamp, command) as handled by the sketch
+        self.master, slave = os.openpty()
+        tty.setraw(slave)
+        self.port = os.ttyname(slave)
+        self.slave = slave
+        self.running = True
+        threading.Thread(target=self._run, daemon=True).start()
+        self._print("System Ready: Car + Arm + Harvest")
+
+    def close(self):
+        self.running = False
+        os.close(self.master); os.close(self.slave)
+
+    def _print(self, line): self._write((line + "\r\n").encode())
+
+    def _write(self, data):
+        time.sleep(len(data) * 10 / self.baud)
+        os.write(self.master, data)
+
+    def _run(self):
+        buf = b''
+        while self.running:
+            ready, _, _ = select.select([self.master], [], [], 0.1)
+            if ready:
+                try: chunk = os.read(self.master, 256)
+                except OSError: return
+                time.sleep(len(chunk) * 10 / self.baud)   # bytes arrive at line rate
+                buf += chunk
+            # readSmartCommand(): one command per loop() pass
+            while buf:
+                if self.framed and buf[0] == protocol.SYNC:
+                    # framed commands: the sketch drains all buffered frames in one pass
+                    while len(buf) >= 2 and buf[0] == protocol.SYNC:
+                        if not 2 <= buf[1] <= protocol.MAX_PAYLOAD + 2: buf = buf[1:]; continue
+                        if len(buf) < buf[1] + 3: break
+                        frame, buf = buf[:buf[1] + 3], buf[buf[1] + 3:]
+                        self._frame(frame)
+                    if buf[:1] == bytes([protocol.SYNC]): break   # wait for the rest
+                elif self.linked:
+                    buf = buf[1:]
+                    continue
+                elif buf[:1].isdigit():
+                    if b'\n' not in buf: break
+                    line, buf = buf.split(b'\n', 1)
+                    try: ch, ang = (int(x) for x in line.split(b','))
+                    except ValueError: continue
+                    self._arm(ch, ang)
+                else:
+                    cmd, buf = buf[:1], buf[1:]
+                    self._car(cmd.decode(errors='ignore'))
+                time.sleep(self.LOOP_DELAY)
+
+    def _frame(self, frame):
+        kind, seq, payload = frame[2], frame[3], frame[4:-1]
+        ack = lambda status: self._write(protocol.encode(protocol.T_ACK, seq, bytes([status])))
+        if protocol.crc8(frame[1:-1]) != frame[-1]: return ack(protocol.ACK_BAD_CRC)
+        self.received.append((time.time(), ('frame', kind, bytes(payload))))
+        if kind == protocol.T_POSE:
+            for ch, ang in protocol.decode_pose(payload).items(): self._arm(ch, ang, log=False)
+            ack(protocol.ACK_OK)
+        elif kind == protocol.T_PUMP:
+            self.pump = payload[0] == 1
+            ack(protocol.ACK_OK)
+        elif kind == protocol.T_REQUEST and payload[0] == protocol.REQ_DISTANCE:
+            cm = int(self.distance(self.pos))
+            time.sleep(min(0.03, 0.0001 + cm * 2 / 34300))
+            self._write(protocol.encode(protocol.T_DISTANCE, seq, min(cm, 65535).to_bytes(2, 'little')))
+        elif kind == protocol.T_REQUEST and payload[0] == protocol.REQ_SOIL:
+            ack(protocol.ACK_OK)
+            self._arm(99, 0, log=False)
+        elif kind == protocol.T_CAR:
+            ack(protocol.ACK_OK)
+            for c in payload.decode(errors='ignore'): self._car(c)
+        elif kind == protocol.T_SERVO:
+            ack(protocol.ACK_OK)
+            self._arm(payload[0], payload[1], log=False)
+        elif kind == protocol.T_HELLO and payload[0] in protocol.BAUD_RATES:
+            self.linked = True
+            ack(protocol.ACK_OK)
+            self.baud = protocol.BAUD_RATES[payload[0]]   # a pty has no real line rate
+        elif kind == protocol.T_PING: ack(protocol.ACK_OK)
+        else: ack(protocol.ACK_UNKNOWN)
+
+    def _car(self, cmd):
+        self.received.append((time.time(), cmd))
+        if cmd == 'U': self._print("AUTO MODE: ON")
+        elif cmd == 'M': self._print("MANUAL MODE: ACTIVE")
+        elif cmd in ('x', '5'): self._print("STOPPED (Auto Mode OFF)")
+
+    def _arm(self, ch, ang, log=True):
+        if log: self.received.append((time.time(), (ch, ang)))
+        if ch == 99:
+            self._print("Status: Checking Soil...")
+            time.sleep(4.2)
+            self._print(f"S:{self.soil}")
+            time.sleep(1.2)
+            self.pump = self.soil > 700
+            self._print("Status: Pump ON" if self.pump else "Status: Pump OFF")
+        elif ch == 98:
+            cm = int(self.distance(self.pos))
+            time.sleep(min(0.03, 0.0001 + cm * 2 / 34300))   # echo time-of-flight, 30 ms pulseIn cap
+            self._print(f"D:{cm}")
+        elif ch == 8:
+            self.pump = ang == 1
+        else:
+            ang = max(0, min(180, ang))
+            if ch == 3: ang = min(ang, 140)
+            self.pos[ch] = ang
+
+# --- 3. Interpreter ---
+class StubInterpreter:
+    def __init__(self, model_path=None, num_threads=None, delay=0.08, classes=10, dtype=np.float32, quantized=False, **kwargs):
+        # quantized=True: uint8 in and out, output scale 1/256 like a fully-quantized classifier
+        self.delay = delay
+        self.input_shape = np.array([1, 224, 224, 3])
+        self.dtype = np.uint8 if quantized else dtype
+        self.out_dtype = np.uint8 if quantized else np.float32
+        self.classes = classes
+        self.input = None
+        self.output = np.zeros((1, classes), dtype=self.out_dtype)
+        self.invocations = 0
+
+    def allocate_tensors(self):
+        self.input = np.zeros(self.input_shape, dtype=self.dtype)
+        self.output = np.zeros((int(self.input_shape[0]), self.classes), dtype=self.out_dtype)
+
+    def resize_tensor_input(self, index, shape, strict=False): self.input_shape = np.array(shape)
+
+    def get_input_details(self):
+        return [{'index': 0, 'shape': self.input_shape, 'dtype': self.dtype,
+                 'quantization': (1 / 255.0, 0) if self.dtype == np.uint8 else (0.0, 0)}]
+
+    def get_output_details(self):
+        return [{'index': 1, 'shape': np.array(self.output.shape), 'dtype': self.out_dtype,
+                 'quantization': (1 / 256.0, 0) if self.out_dtype == np.uint8 else (0.0, 0)}]
+
+    def set_tensor(self, index, value): self.input[...] = value
+
+    def invoke(self):
+        time.sleep(self.delay)
+        self.invocations += 1
+        # Deterministic per image: the class follows the mean pixel value
+        means = self.input.reshape(len(self.input), -1).mean(axis=1)
+        logits = np.zeros(self.output.shape, dtype=np.float32)
+        logits[np.arange(len(means)), (means * 37).astype(int) % self.classes] = 4.0
+        e = np.exp(logits)
+        probs = e / e.sum(axis=1, keepdims=True)
+        self.output[...] = np.clip(np.round(probs * 256), 0, 255) if self.out_dtype == np.uint8 else probs
+
+    def get_tensor(self, index): return self.output.copy()
@@ -0,0 +1,45 @@
+import threading
+import time
+
+# Authoritative UI state (arm angles, car, pump, status line) shared by every
+# browser. Writers only update a dict; one thread sends whatever changed since
+# its last tick as a single 'state' message, at most `hz` times a second, and
+# a client that connects late is sent the whole dict.
+
+class StateBroadcaster:
+    def __init__(self, emit, initial, hz=20):
+        self.emit = emit          # fn(event, data)
+        self.period = 1.0 / hz
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.state = dict(initial)
+        self.dirty = {}
+        self.updates = 0          # set() values received
+        self.messages = 0         # 'state' messages sent
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def set(self, **values):
+        # 'status' always goes out, even when the same message repeats
+        with self.lock:
+            self.updates += len(values)
+            for key, value in values.items():
+                if self.state.get(key) == value and key != 'status': continue
+                self.state[key] = value
+                self.dirty[key] = value
+            if self.dirty: self.wake.set()
+
+    def snapshot(self):
+        with self.lock: return dict(self.state)
+
+    def _run(self):
+        while True:
+            self.wake.wait()
+            with self.lock:
+                diff, self.dirty = self.dirty, {}
+                self.wake.clear()
+            try:
+                self.emit('state', diff)
+                self.messages += 1
+            except Exception as e:
+                print(f"⚠️ State Broadcast Error: {e}")
+            time.sleep(self.period)   # later changes pile up into the next diff
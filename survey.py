@@ -0,0 +1,193 @@
+import argparse
+import csv
+import glob
+import multiprocessing
+import os
+import sqlite3
+import sys
+import threading
+import time
+import cv2
+import numpy as np
+from vision import CLASSES, TensorPreprocessor, dequantize, find_targets
+from backends import load_config, FACTORIES
+from models import load_manifest
+
+# Offline survey pipeline: streams a video file or an image folder through the
+# same preprocessing, disease model and RED/GREEN detection the live robot
+# uses, one interpreter per worker process. Results come back in frame order.
+#   python survey.py field_row3.mp4 --csv row3.csv --db survey.db
+#   python survey.py Scan_Photos/ --workers 4 --every 5
+# Library use: for row in survey.run(source): ...
+# Class labels come from the model's manifest (models.py) when it has one.
+
+IMAGE_EXTS = ('.jpg', '.jpeg', '.png', '.bmp')
+FIELDS = ["index", "source", "t", "class", "confidence", "red", "red_box", "green", "green_box"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS frames (
+    id INTEGER PRIMARY KEY,
+    run TEXT NOT NULL,
+    idx INTEGER,
+    source TEXT,
+    t REAL,
+    class_name TEXT,
+    confidence REAL,
+    probs BLOB,
+    red INTEGER,
+    red_box TEXT,
+    green INTEGER,
+    green_box TEXT
+);
+CREATE INDEX IF NOT EXISTS frames_run ON frames(run, idx);
+CREATE INDEX IF NOT EXISTS frames_class ON frames(class_name);
+"""
+
+# --- 1. Frame sources ---
+def iter_frames(source, every=1):
+    # -> (index, source name, seconds into video or None, BGR frame), read lazily
+    if os.path.isdir(source):
+        paths = sorted(p for p in glob.glob(os.path.join(source, '*')) if p.lower().endswith(IMAGE_EXTS))
+        for i, path in enumerate(paths[::every]):
+            img = cv2.imread(path)
+            if img is not None: yield i, os.path.basename(path), None, img
+        return
+    cap = cv2.VideoCapture(source)
+    if not cap.isOpened(): raise IOError(f"cannot open {source}")
+    i = n = 0
+    try:
+        while True:
+            if not cap.grab(): break
+            if n % every == 0:
+                ok, img = cap.retrieve()
+                if ok:
+                    yield i, os.path.basename(source), round(cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0, 3), img
+                    i += 1
+            n += 1
+    finally:
+        cap.release()
+
+# --- 2. Workers ---
+_worker = {}
+
+def _init_worker(model_cfg, size):
+    cfg = dict(model_cfg, threads=1)   # parallelism comes from the pool
+    interpreter = FACTORIES['model'][cfg['backend']](cfg)
+    _worker.update(interpreter=interpreter, size=tuple(size), classes=load_manifest(cfg, CLASSES)['classes'],
+                   input=interpreter.get_input_details()[0], output=interpreter.get_output_details()[0],
+                   preprocess=TensorPreprocessor(interpreter.get_input_details()[0]))
+
+def _box(t): return "" if t is None else f"{t[0]},{t[1]},{t[2]},{t[3]}"
+
+def analyse(item):
+    # One frame: disease probabilities plus RED/GREEN fruit counts and largest boxes
+    index, name, t, bgr = item
+    w = _worker
+    if bgr.shape[1::-1] != w['size']: bgr = cv2.resize(bgr, w['size'], interpolation=cv2.INTER_AREA)
+    w['interpreter'].set_tensor(w['input']['index'], w['preprocess'](cv2.cvtColor(bgr, cv2.COLOR_BGR2BGRA)))
+    w['interpreter'].invoke()
+    probs = np.asarray(dequantize(w['interpreter'].get_tensor(w['output']['index']), w['output'])[0], dtype=np.float32)
+    idx = int(np.argmax(probs))
+    row = {"index": index, "source": name, "t": t, "class": w['classes'][idx], "confidence": round(float(probs[idx]), 4), "probs": probs}
+    for color in ('RED', 'GREEN'):
+        targets = find_targets(bgr, color)
+        row[color.lower()] = len(targets)
+        row[color.lower() + "_box"] = _box(targets[0] if targets else None)
+    return row
+
+# --- 3. Pipeline ---
+def run(source, model_cfg=None, workers=None, every=1, size=None, inflight=None):
+    # Ordered generator of per-frame result dicts; frames are read only as
+    # fast as the pool drains them, so a long video never sits in memory
+    config = load_config()
+    model_cfg = model_cfg or config['model']
+    size = size or config['camera']['size']
+    workers = workers or os.cpu_count() or 1
+    slots = threading.BoundedSemaphore(inflight or workers * 4)
+    stop = threading.Event()
+    def feed():
+        # runs on the pool's task thread: it must notice `stop`, or terminate() waits on it forever
+        frames = iter_frames(source, every)
+        try:
+            for item in frames:
+                while not slots.acquire(timeout=0.1):
+                    if stop.is_set(): return
+                if stop.is_set(): return
+                yield item
+        finally:
+            frames.close()
+    with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(model_cfg, size)) as pool:
+        try:
+            for row in pool.imap(analyse, feed()):
+                slots.release()
+                yield row
+        finally:
+            stop.set()   # consumer done or gone (break, Ctrl-C, writer error)
+
+class SurveyWriter:
+    # CSV and/or SQLite sinks; SQLite rows go in one transaction per batch
+    def __init__(self, csv_path=None, db_path=None, run_id=None, batch_size=200, classes=CLASSES):
+        self.classes = classes
+        self.run_id = run_id or time.strftime('%Y-%m-%d_%H-%M-%S')
+        self.batch_size = batch_size
+        self.pending = []
+        self.csv_file = self.csv = self.db = None
+        if csv_path:
+            self.csv_file = sys.stdout if csv_path == '-' else open(csv_path, 'w', newline='')
+            self.csv = csv.DictWriter(self.csv_file, FIELDS + self.classes, extrasaction='ignore')
+            self.csv.writeheader()
+        if db_path:
+            self.db = sqlite3.connect(db_path)
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.executescript(SCHEMA)
+
+    def write(self, row):
+        if self.csv:
+            self.csv.writerow({**row, **{c: round(float(p), 4) for c, p in zip(self.classes, row['probs'])}})
+        if self.db:
+            self.pending.append((self.run_id, row['index'], row['source'], row['t'], row['class'], row['confidence'],
+                                 row['probs'].tobytes(), row['red'], row['red_box'], row['green'], row['green_box']))
+            if len(self.pending) >= self.batch_size: self.flush()
+
+    def flush(self):
+        if self.db and self.pending:
+            with self.db:
+                self.db.executemany("INSERT INTO frames (run, idx, source, t, class_name, confidence, probs, red, red_box, green, green_box) "
+                                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", self.pending)
+            self.pending = []
+
+    def close(self):
+        self.flush()
+        if self.db: self.db.close()
+        if self.csv_file and self.csv_file is not sys.stdout: self.csv_file.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Classify and detect fruit in recorded survey footage")
+    parser.add_argument('source', help="video file or image directory")
+    parser.add_argument('--csv', help="write per-frame rows here ('-' for stdout)")
+    parser.add_argument('--db', help="append per-frame rows to this SQLite file")
+    parser.add_argument('--run', help="run id stored with SQLite rows (default: start time)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--every', type=int, default=1, help="process every Nth frame/image")
+    parser.add_argument('--model', help="TFLite model path (default: from agribot.json)")
+    parser.add_argument('--backend', help="model backend, e.g. 'stub' to test without a model")
+    args = parser.parse_args(argv)
+    if not args.csv and not args.db: args.csv = '-'
+    model_cfg = dict(load_config()['model'])
+    if args.model: model_cfg['path'] = args.model
+    if args.backend: model_cfg['backend'] = args.backend
+    writer = SurveyWriter(args.csv, args.db, args.run, classes=load_manifest(model_cfg, CLASSES)['classes'])
+    t0, n, counts = time.time(), 0, {}
+    try:
+        for row in run(args.source, model_cfg, args.workers, args.every):
+            writer.write(row)
+            n += 1
+            counts[row['class']] = counts.get(row['class'], 0) + 1
+            if n % 100 == 0: print(f"{n} frames, {n / (time.time() - t0):.1f} fps", file=sys.stderr)
+    finally:
+        writer.close()
+    print(f"✅ {n} frames in {time.time() - t0:.1f}s ({n / max(time.time() - t0, 1e-9):.1f} fps, {args.workers} workers)", file=sys.stderr)
+    for name, c in sorted(counts.items(), key=lambda kv: -kv[1]): print(f"  {name:<45} {c}", file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
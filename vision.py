@@ -0,0 +1,232 @@
+import itertools
+import numpy as np
+import cv2
+
+# Hardware-free image helpers shared by the web app, the benchmarks and any
+# offline tooling. Nothing in here may touch the camera, serial port or model.
+
+# Model output order of the tomato disease classifier
+CLASSES = ["Tomato___Bacterial_spot", "Tomato___Early_blight", "Tomato___Late_blight", "Tomato___Leaf_Mold", "Tomato___Septoria_leaf_spot", "Tomato___Spider_mites Two-spotted_spider_mite", "Tomato___Target_Spot", "Tomato___Tomato_Yellow_Leaf_Curl_Virus", "Tomato___Tomato_mosaic_virus", "Tomato___healthy"]
+
+# --- 1. Input Tensor Preprocessing ---
+# Converts the raw XRGB8888 camera array (BGRA byte order) straight into a
+# preallocated model input tensor: resize, channel drop and normalisation run
+# into fixed buffers, so a scan allocates nothing. uint8 models with an
+# identity quantisation get the RGB pixels written directly into the tensor.
+class TensorPreprocessor:
+    def __init__(self, input_detail):
+        shape = tuple(int(x) for x in input_detail['shape'])
+        self.height, self.width = shape[1], shape[2]
+        self.dtype = np.dtype(input_detail['dtype'])
+        self.tensor = np.zeros(shape, dtype=self.dtype)
+        self.resized = np.empty((self.height, self.width, 4), dtype=np.uint8)
+        self.lut = self._build_lut(input_detail.get('quantization', (0.0, 0)))
+        # Identity LUT: cvtColor writes the model input directly
+        self.rgb = self.tensor[0] if self.lut is None else np.empty((self.height, self.width, 3), dtype=np.uint8)
+
+    def _build_lut(self, quantization):
+        pixels = np.arange(256, dtype=np.float32) / 255.0
+        if self.dtype == np.float32:
+            return pixels.reshape(256, 1)
+        scale, zero_point = quantization
+        if not scale: scale, zero_point = 1.0 / 255.0, 0
+        info = np.iinfo(self.dtype)
+        q = np.clip(np.round(pixels / scale + zero_point), info.min, info.max).astype(self.dtype)
+        if self.dtype == np.uint8 and np.array_equal(q, np.arange(256)): return None
+        return q.reshape(256, 1)
+
+    def __call__(self, xrgb, slot=0):
+        # Fills batch entry `slot`; input already at model size skips the resize
+        src = xrgb
+        if xrgb.shape[:2] != (self.height, self.width):
+            cv2.resize(xrgb, (self.width, self.height), dst=self.resized, interpolation=cv2.INTER_AREA)
+            src = self.resized
+        rgb = self.tensor[slot] if self.lut is None else self.rgb
+        cv2.cvtColor(src, cv2.COLOR_BGRA2RGB, dst=rgb)
+        if self.lut is not None:
+            cv2.LUT(rgb, self.lut, dst=self.tensor[slot])
+        return self.tensor
+
+def dequantize(output, output_detail):
+    # Integer outputs of fully-quantized models -> real scores (probabilities)
+    if not np.issubdtype(output.dtype, np.integer): return output
+    scale, zero_point = output_detail.get('quantization', (0.0, 0))
+    if not scale: return output.astype(np.float32)
+    return (output.astype(np.float32) - zero_point) * scale
+
+# --- 2. Color Tracking ---
+# HSV boxes per target color, converted once to the bound arrays inRange()
+# wants. RED wraps around hue 0 and needs two boxes.
+HSV_RANGES = {
+    'RED': [((0, 120, 70), (10, 255, 255)), ((170, 120, 70), (180, 255, 255))],
+    'GREEN': [((35, 50, 50), (85, 255, 255))],
+}
+COLOR_BOUNDS = {name: [(np.array(lo, np.uint8), np.array(hi, np.uint8)) for lo, hi in ranges] for name, ranges in HSV_RANGES.items()}
+
+def color_mask(bgr, color):
+    hsv = cv2.cvtColor(bgr, cv2.COLOR_BGR2HSV)
+    bounds = COLOR_BOUNDS[color]
+    mask = cv2.inRange(hsv, *bounds[0])
+    for lo, hi in bounds[1:]:
+        cv2.bitwise_or(mask, cv2.inRange(hsv, lo, hi), dst=mask)
+    return mask
+
+def largest_blob(mask, min_area):
+    # External contours only; no hierarchy is needed for "biggest fruit"
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    if not contours: return None
+    largest = max(contours, key=cv2.contourArea)
+    area = cv2.contourArea(largest)
+    if area < min_area: return None
+    return cv2.boundingRect(largest) + (int(area),)
+
+# Tracks the largest blob of one color. Later frames only search a window
+# around the last hit; on a miss the whole frame is searched at reduced
+# resolution, so a 640x480 frame costs about what a 320x240 one used to.
+class ColorTracker:
+    def __init__(self, color='RED', min_area=400, margin=0.75, search_scale=0.5):
+        self.color = color
+        self.min_area = min_area
+        self.margin = margin
+        self.search_scale = search_scale
+        self.box = None
+
+    def set_color(self, color):
+        if color != self.color: self.color = color; self.box = None
+
+    def reset(self): self.box = None
+
+    def _largest(self, bgr, min_area):
+        return largest_blob(color_mask(bgr, self.color), min_area)
+
+    def detect(self, frame):
+        fh, fw = frame.shape[:2]
+        if self.box:
+            x, y, w, h, _ = self.box
+            mx, my = int(w * self.margin) + 16, int(h * self.margin) + 16
+            x0, y0, x1, y1 = max(x - mx, 0), max(y - my, 0), min(x + w + mx, fw), min(y + h + my, fh)
+            hit = self._largest(frame[y0:y1, x0:x1], self.min_area)
+            if hit:
+                self.box = (hit[0] + x0, hit[1] + y0, hit[2], hit[3], hit[4])
+                return self.box
+        s = self.search_scale
+        small = cv2.resize(frame, (int(fw * s), int(fh * s)), interpolation=cv2.INTER_NEAREST)
+        hit = self._largest(small, self.min_area * s * s)
+        self.box = None if hit is None else (int(hit[0] / s), int(hit[1] / s), int(hit[2] / s), int(hit[3] / s), int(hit[4] / (s * s)))
+        return self.box
+
+# --- 2.1 Multi-Target Planning ---
+OPEN_KERNEL = np.ones((5, 5), np.uint8)
+
+def find_targets(bgr, color, min_area=400, min_width=0, limit=8):
+    # Every blob of one color from a single connectedComponentsWithStats pass
+    # -> [(x, y, w, h, area, cx, cy), ...] largest first
+    mask = cv2.morphologyEx(color_mask(bgr, color), cv2.MORPH_OPEN, OPEN_KERNEL)
+    n, _, stats, centroids = cv2.connectedComponentsWithStats(mask, connectivity=8)
+    targets = [tuple(int(v) for v in stats[i]) + (float(centroids[i][0]), float(centroids[i][1]))
+               for i in range(1, n) if stats[i, cv2.CC_STAT_AREA] >= min_area and stats[i, cv2.CC_STAT_WIDTH] >= min_width]
+    targets.sort(key=lambda t: -t[4])
+    return targets[:limit]
+
+def pixel_to_angle(cx, width, base_angle, hfov):
+    # Base angle that puts pixel column cx on the image centre (right of centre = smaller angle)
+    return base_angle - (cx - width / 2) * hfov / width
+
+def travel(start, angles, drop=None):
+    # Total base travel in degrees to visit `angles` in order, via `drop` after each
+    total, at = 0.0, start
+    for a in angles:
+        total += abs(a - at)
+        at = a
+        if drop is not None: total += abs(drop - at); at = drop
+    return total
+
+def plan_order(start, angles, drop=None):
+    # Visit order (indices) with the least base travel: exhaustive for a
+    # handful of fruit, else a sweep from the end nearest the start
+    idx = list(range(len(angles)))
+    if len(idx) <= 7:
+        return list(min(itertools.permutations(idx), key=lambda p: travel(start, [angles[i] for i in p], drop)))
+    idx.sort(key=lambda i: angles[i])
+    return idx if abs(angles[idx[0]] - start) <= abs(angles[idx[-1]] - start) else idx[::-1]
+
+# --- 3. Tiled Scanning ---
+def tile_origins(size, tile, overlap=0.25):
+    # Top-left corners of overlapping tile x tile windows covering a (w, h) frame
+    w, h = size
+    stride = max(1, int(tile * (1 - overlap)))
+    def axis(length):
+        if length <= tile: return [0]
+        n = int(np.ceil((length - tile) / stride)) + 1
+        return [int(round(v)) for v in np.linspace(0, length - tile, n)]
+    return [(x, y) for y in axis(h) for x in axis(w)]
+
+def severity_heatmap(frame_bgr, origins, tile, severity, cell=8, alpha=0.45):
+    # Averages per-tile severity (0..1) over the overlaps and blends it as a colormap
+    h, w = frame_bgr.shape[:2]
+    acc = np.zeros((h // cell + 1, w // cell + 1), np.float32)
+    cnt = np.zeros_like(acc)
+    for (x, y), sev in zip(origins, severity):
+        acc[y // cell:(y + tile) // cell, x // cell:(x + tile) // cell] += sev
+        cnt[y // cell:(y + tile) // cell, x // cell:(x + tile) // cell] += 1
+    heat = np.divide(acc, cnt, out=np.zeros_like(acc), where=cnt > 0)
+    heat = cv2.resize(heat, (w, h), interpolation=cv2.INTER_LINEAR)
+    colored = cv2.applyColorMap(np.clip(heat * 255, 0, 255).astype(np.uint8), cv2.COLORMAP_JET)
+    return cv2.addWeighted(frame_bgr, 1 - alpha, colored, alpha, 0)
+
+# --- 4. Change Gating & Temporal Smoothing ---
+def dhash(bgra, size=8):
+    # 64-bit difference hash of a (size+1) x size grayscale thumbnail
+    gray = cv2.cvtColor(cv2.resize(bgra, (size + 1, size), interpolation=cv2.INTER_AREA), cv2.COLOR_BGRA2GRAY)
+    return int.from_bytes(np.packbits(gray[:, 1:] > gray[:, :-1]).tobytes(), 'big')
+
+class SceneGate:
+    # Passes a frame on only when it differs from the last one that was passed:
+    # dHash Hamming distance or mean absolute difference of a 32x24 thumbnail
+    def __init__(self, hash_bits=6, diff_threshold=8.0, max_age=10.0):
+        self.hash_bits = hash_bits
+        self.diff_threshold = diff_threshold
+        self.max_age = max_age   # re-check a static scene this often anyway
+        self.reset()
+
+    def reset(self):
+        self.hash = None
+        self.thumb = None
+        self.passed_at = 0.0
+
+    def changed(self, bgra, now):
+        thumb = cv2.cvtColor(cv2.resize(bgra, (32, 24), interpolation=cv2.INTER_AREA), cv2.COLOR_BGRA2GRAY)
+        h = dhash(bgra)
+        if self.hash is not None and now - self.passed_at < self.max_age:
+            if bin(h ^ self.hash).count('1') <= self.hash_bits and cv2.absdiff(thumb, self.thumb).mean() <= self.diff_threshold:
+                return False
+        self.hash, self.thumb, self.passed_at = h, thumb, now
+        return True
+
+class ProbabilitySmoother:
+    # Mean of the last `window` probability vectors; a class is confirmed only
+    # when it leads the mean with `threshold` over at least `min_frames` frames
+    def __init__(self, classes, window=5, threshold=0.6, min_frames=3):
+        self.buf = np.zeros((window, classes), dtype=np.float32)
+        self.threshold = threshold
+        self.min_frames = min_frames
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+
+    def update(self, probs):
+        self.buf[self.count % len(self.buf)] = np.asarray(probs, dtype=np.float32).ravel()
+        self.count += 1
+        return self.mean()
+
+    def mean(self):
+        n = min(self.count, len(self.buf))
+        return self.buf[:n].mean(axis=0) if n else np.zeros(self.buf.shape[1], dtype=np.float32)
+
+    def decision(self):
+        # -> (class index, smoothed confidence) or (None, confidence) while unsure
+        mean = self.mean()
+        idx = int(np.argmax(mean))
+        confident = self.count >= self.min_frames and mean[idx] >= self.threshold
+        return (idx if confident else None), float(mean[idx])